@@ -0,0 +1,157 @@
+"""
+A* có trọng số dạng anytime: có lời giải nhanh rồi cải thiện dần tới khi hết giờ
+
+Chạy lại A* với f = g + w*h cho các trọng số w giảm dần. Lời giải tốt nhất
+hiện có dùng làm cận trên: nút có g + h >= chi phí của nó bị cắt. Mỗi lời
+giải đi kèm hệ số chứng minh được: chi phí <= bound * chi phí tối ưu.
+"""
+import heapq
+import time
+
+from astar_solver import SUCCESSORS, NodeStore, make_estimator, path_to_moves
+from board import as_level, normalize_player
+from deadlock import DeadlockDetector
+from heuristics import INF
+from transposition import TranspositionTable, Zobrist
+
+# Heuristic ghép cặp đã sát với số cú đẩy thật, trọng số lớn ở mode "push"
+# khiến tìm kiếm lao vào các nhánh bế tắc nên bắt đầu thấp hơn
+DEFAULT_WEIGHTS = {
+    "move": (5.0, 3.0, 2.0, 1.5, 1.25, 1.0),
+    "push": (1.5, 1.25, 1.1, 1.0),
+}
+
+class _Budget:
+    """Hết giờ, hết số nút hoặc bị huỷ từ bên ngoài"""
+
+    def __init__(self, time_limit, node_limit, cancel):
+        self.expires = time.monotonic() + time_limit if time_limit else None
+        self.node_limit = node_limit
+        self.cancel = cancel
+        self.nodes = 0
+
+    def exhausted(self):
+        if self.cancel is not None and self.cancel.is_set():
+            return True
+        if self.node_limit and self.nodes >= self.node_limit:
+            return True
+        return self.expires is not None and time.monotonic() > self.expires
+
+def _weighted_search(level, mode, weight, incumbent, successors, detector, estimator,
+                     zobrist, budget, stats):
+    """Một lượt A* với trọng số weight, cắt theo chi phí incumbent.
+
+    Trả về (đường đi, chi phí, cận dưới của chi phí tối ưu) nếu tìm được
+    lời giải rẻ hơn incumbent, "exhausted" nếu đã duyệt hết (incumbent là
+    tối ưu), None nếu hết ngân sách.
+    """
+    initial_player = level.initial_player
+    initial_boxes = level.initial_boxes
+    if mode == "push":
+        initial_player = normalize_player(level.reachable(initial_player, initial_boxes))
+    initial_h = estimator.evaluate(initial_boxes)
+    if initial_h is None or initial_h >= incumbent:
+        return "exhausted"
+
+    nodes = NodeStore()
+    table = TranspositionTable()
+    if stats is not None:
+        stats.track_table(table)  # Thống kê của lượt gần nhất
+    initial_key = zobrist.hash(initial_player, initial_boxes)
+    # (f có trọng số, h, g, nút)
+    open_set = [(weight * initial_h, initial_h, 0,
+                 nodes.add(-1, -1, initial_player, initial_boxes, initial_key))]
+    table.offer(initial_key, 0)
+
+    while open_set:
+        f_score, h, g_score, node = heapq.heappop(open_set)
+        key = nodes.keys[node]
+        best_g = table.get(key)
+        if best_g is not None and best_g < g_score:
+            continue
+        if budget.exhausted():
+            return None
+        budget.nodes += 1
+        if stats is not None:
+            stats.expand(f_score, len(open_set))
+
+        player = nodes.players[node]
+        boxes = nodes.boxes[node]
+        if level.is_solved(boxes):
+            # Mọi lời giải tối ưu đều còn một nút trong hàng đợi, nên g + h nhỏ nhất là cận dưới
+            lower = min([g_score] + [g + h for _, h, g, _ in open_set])
+            return nodes.path(node), g_score, lower
+
+        for new_player, new_boxes, push, move_code in successors(level, player, boxes, detector):
+            new_g = g_score + 1
+            new_h = h
+            if push is not None:
+                new_h = estimator.update(boxes, push[0], push[1], new_boxes)
+                if new_h is None:
+                    continue
+            # Không thể rẻ hơn lời giải đã có
+            if new_g + new_h >= incumbent:
+                continue
+            new_key = zobrist.child(key, player, new_player, push)
+            if not table.offer(new_key, new_g):
+                if stats is not None:
+                    stats.duplicates += 1
+                continue
+            child = nodes.add(node, move_code, new_player, new_boxes, new_key)
+            heapq.heappush(open_set, (new_g + weight * new_h, new_h, new_g, child))
+            if stats is not None:
+                stats.generated += 1
+    return "exhausted"
+
+def anytime_search(initial_grid, mode="push", time_limit=None, node_limit=None,
+                   weights=None, stats=None, cancel=None, on_improve=None,
+                   heuristic="matching", patterns=None):
+    """Tìm lời giải trong ngân sách thời gian/số nút, cải thiện dần theo weights.
+
+    Trả về (lời giải U/D/L/R, bound) với chi phí lời giải <= bound * tối ưu
+    (chi phí tính theo mode: số bước hoặc số cú đẩy); bound = 1.0 nghĩa là
+    đã chứng minh tối ưu. Trả về (None, None) nếu không có lời giải trong
+    ngân sách. on_improve(lời giải, bound) được gọi mỗi khi có lời giải tốt hơn.
+    weights: dãy trọng số giảm dần, mặc định theo DEFAULT_WEIGHTS[mode].
+    patterns: PatternStore các mẫu deadlock, như astar_solve.
+    """
+    level = as_level(initial_grid)
+    if level.initial_player < 0:
+        return None, None
+    successors = SUCCESSORS[mode]
+    detector = DeadlockDetector(level, patterns)
+    # Dùng chung giữa các lượt: bảng heuristic đã tính vẫn còn giá trị
+    estimator = make_estimator(level, heuristic)
+    zobrist = Zobrist(level)
+    if stats is not None:
+        successors = stats.timed_successors(successors)
+        estimator = stats.timed_heuristic(estimator)
+    budget = _Budget(time_limit, node_limit, cancel)
+    if weights is None:
+        weights = DEFAULT_WEIGHTS[mode]
+
+    best, best_cost, bound = None, INF, None
+    for weight in weights:
+        outcome = _weighted_search(level, mode, weight, best_cost, successors, detector,
+                                   estimator, zobrist, budget, stats)
+        if outcome is None:
+            break
+        if outcome == "exhausted":
+            # Không còn lời giải nào rẻ hơn: lời giải hiện có là tối ưu
+            if best is not None:
+                bound = 1.0
+            break
+        path, best_cost, lower = outcome
+        best = path_to_moves(level, mode, path)
+        bound = min(weight, best_cost / lower) if lower else weight
+        if on_improve is not None:
+            on_improve(best, bound)
+        if bound <= 1.0:
+            break
+    return best, bound
+
+def anytime_solve(initial_grid, mode="push", time_limit=None, node_limit=None,
+                  stats=None, cancel=None, heuristic="matching", patterns=None):
+    """Như anytime_search nhưng chỉ trả về lời giải (dùng qua solvers.solve)"""
+    return anytime_search(initial_grid, mode, time_limit, node_limit, stats=stats,
+                          cancel=cancel, heuristic=heuristic, patterns=patterns)[0]
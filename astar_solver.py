@@ -2,184 +2,218 @@
 Thuật toán A* để giải Sokoban
 """
 import heapq
-from copy import deepcopy
-
-def manhattan_distance(x1, y1, x2, y2):
-    """Tính khoảng cách Manhattan"""
-    return abs(x1 - x2) + abs(y1 - y2)
-
-def get_goals(grid):
-    """Lấy danh sách vị trí đích"""
-    goals = []
-    for y, row in enumerate(grid):
-        for x, c in enumerate(row):
-            if c == ".":
-                goals.append((x, y))
-    return goals
-
-def get_boxes(grid):
-    """Lấy danh sách vị trí các thùng"""
-    boxes = []
-    for y, row in enumerate(grid):
-        for x, c in enumerate(row):
-            if c in ("$", "*"):
-                boxes.append((x, y))
-    return tuple(sorted(boxes))  # Sắp xếp để so sánh
-
-def get_player(grid):
-    """Lấy vị trí người chơi"""
-    for y, row in enumerate(grid):
-        for x, c in enumerate(row):
-            if c in ("@", "+"):
-                return (x, y)
-    return None
-
-def is_valid_move(grid, x, y):
-    """Kiểm tra vị trí có hợp lệ không"""
-    if y < 0 or y >= len(grid) or x < 0 or x >= len(grid[0]):
-        return False
-    return grid[y][x] != "#"
-
-def heuristic(boxes, goals):
-    """Heuristic: tổng khoảng cách Manhattan từ các boxes đến goals gần nhất"""
-    if not boxes or not goals:
-        return 0
-    
-    # Tính tổng khoảng cách từ mỗi box đến goal gần nhất
-    total = 0
-    used_goals = set()
-    
-    for box in boxes:
-        min_dist = float('inf')
-        best_goal = None
-        for goal in goals:
-            if goal not in used_goals:
-                dist = manhattan_distance(box[0], box[1], goal[0], goal[1])
-                if dist < min_dist:
-                    min_dist = dist
-                    best_goal = goal
-        if best_goal:
-            total += min_dist
-            used_goals.add(best_goal)
-    3
-    return total
-
-def apply_move(grid, player_pos, dx, dy):
-    """Áp dụng nước đi và trả về state mới"""
-    new_grid = deepcopy(grid)
-    px, py = player_pos
-    tx, ty = px + dx, py + dy
-    
-    # Kiểm tra ô đích
-    if not is_valid_move(new_grid, tx, ty):
-        return None, None
-    
-    target = new_grid[ty][tx]
-    
-    # Nếu là tường
-    if target == "#":
-        return None, None
-    
-    # Nếu là thùng, cần đẩy
-    if target in ("$", "*"):
-        bx, by = tx + dx, ty + dy
-        if not is_valid_move(new_grid, bx, by):
-            return None, None
-        behind = new_grid[by][bx]
-        if behind in ("#", "$", "*"):
-            return None, None
-        
-        # Đẩy thùng
-        if behind == ".":
-            new_grid[by][bx] = "*"  # Thùng trên goal
-        else:
-            new_grid[by][bx] = "$"  # Thùng trên sàn
-        
-        # Cập nhật vị trí cũ của thùng
-        if target == "$":
-            new_grid[ty][tx] = "@"  # Player trên sàn
-        else:
-            new_grid[ty][tx] = "+"  # Player trên goal
-    else:
-        # Di chuyển bình thường
-        if target == ".":
-            new_grid[ty][tx] = "+"  # Player trên goal
+from array import array
+
+from board import DIRECTIONS, as_level, normalize_player
+from deadlock import DeadlockDetector
+from heuristics import MatchingHeuristic
+from transposition import TranspositionTable, Zobrist
+
+# Tăng mỗi khi thay đổi làm lời giải trả về khác đi (làm mới cache lời giải)
+SOLVER_VERSION = "1"
+
+def move_successors(level, player, boxes, detector):
+    """Sinh trạng thái con theo từng bước U/D/L/R"""
+    for d in range(4):
+        result = level.move(player, boxes, d)
+        if result is None:
+            continue
+        new_player, new_boxes, pushed = result
+        push = None
+        if pushed:
+            push = (new_player, level.neighbors[new_player][d])
+            if detector.is_deadlock(new_boxes, push[1]):
+                continue
+        yield new_player, new_boxes, push, d
+
+def push_successors(level, player, boxes, detector):
+    """Sinh trạng thái con theo từng cú đẩy thùng.
+
+    Người chơi được chuẩn hoá về ô nhỏ nhất trong vùng đi tới được,
+    nên các trạng thái chỉ khác nhau ở đoạn đi bộ được gộp làm một.
+    """
+    region = level.reachable(player, boxes)
+    for box, d, new_boxes in level.pushes(region, boxes):
+        target = level.neighbors[box][d]
+        if detector.is_deadlock(new_boxes, target):
+            continue
+        new_player = normalize_player(level.reachable(box, new_boxes))
+        yield new_player, new_boxes, (box, target), box * 4 + d
+
+class NodeStore:
+    """Bảng nút tìm kiếm lưu bằng mảng gọn: nút cha, mã nước đi và trạng thái.
+
+    Mỗi nút chỉ tốn vài số nguyên; đường đi được dựng lại một lần
+    bằng cách lần ngược con trỏ cha.
+    """
+
+    def __init__(self):
+        self.parents = array('i')
+        self.moves = array('i')
+        self.players = array('i')
+        self.keys = array('Q')
+        self.boxes = []
+
+    def add(self, parent, move, player, boxes, key):
+        """Thêm một nút, trả về chỉ số của nút"""
+        self.parents.append(parent)
+        self.moves.append(move)
+        self.players.append(player)
+        self.keys.append(key)
+        self.boxes.append(boxes)
+        return len(self.boxes) - 1
+
+    def path(self, node):
+        """Danh sách mã nước đi từ gốc tới node"""
+        moves = []
+        while self.parents[node] >= 0:
+            moves.append(self.moves[node])
+            node = self.parents[node]
+        moves.reverse()
+        return moves
+
+    def __len__(self):
+        return len(self.boxes)
+
+def path_to_moves(level, mode, path, macros=None):
+    """Đổi danh sách mã nước đi của một lời giải thành các bước U/D/L/R
+
+    macros: MacroAnalysis đã sinh các mã macro trong path (chỉ mode "push").
+    """
+    if mode == "push":
+        if macros is not None:
+            pushes = macros.expand(path)
         else:
-            new_grid[ty][tx] = "@"  # Player trên sàn
-    
-    # Cập nhật vị trí cũ của player
-    old_char = new_grid[py][px]
-    if old_char == "@":
-        new_grid[py][px] = " "
-    elif old_char == "+":
-        new_grid[py][px] = "."
-    
-    new_player = (tx, ty)
-    return new_grid, new_player
-
-def is_goal_state(boxes, goals):
-    """Kiểm tra đã đạt goal state chưa"""
-    if len(boxes) != len(goals):
-        return False
-    return set(boxes) == set(goals)
-
-def state_to_key(player_pos, boxes):
-    """Chuyển state thành key để so sánh"""
-    return (player_pos, boxes)
-
-def astar_solve(initial_grid):
-    """Thuật toán A* để giải Sokoban"""
-    # Khởi tạo
-    goals = get_goals(initial_grid)
-    initial_boxes = get_boxes(initial_grid)
-    initial_player = get_player(initial_grid)
-    
-    if not initial_player:
+            pushes = [divmod(code, 4) for code in path]
+        return level.pushes_to_moves(level.initial_player, level.initial_boxes, pushes)
+    return [DIRECTIONS[d][2] for d in path]
+
+SUCCESSORS = {
+    "move": move_successors,
+    "push": push_successors,
+}
+
+HEURISTICS = ("matching", "pdb")
+
+def make_estimator(level, heuristic="matching"):
+    """Tạo heuristic theo tên: "matching" (ghép cặp thùng-đích) hoặc
+    "pdb" (max của ghép cặp và tổng các cặp thùng trong pattern database)"""
+    if heuristic == "matching":
+        return MatchingHeuristic(level)
+    if heuristic == "pdb":
+        from pattern_db import PatternDatabaseHeuristic
+        return PatternDatabaseHeuristic(level)
+    raise ValueError(f"Heuristic không hợp lệ: {heuristic}")
+
+def astar_solve(initial_grid, mode="move", table=None, stats=None, cancel=None,
+                heuristic="matching", macros=False, patterns=None):
+    """Thuật toán A* để giải Sokoban
+
+    mode="move": mỗi bước đi là một nút, lời giải ngắn nhất theo số bước.
+    mode="push": mỗi cú đẩy là một nút, lời giải ít cú đẩy nhất; đoạn đi
+    bộ giữa các cú đẩy chỉ được dựng lại khi đã tìm thấy lời giải.
+
+    table: TranspositionTable dùng thay cho tập đã thăm; truyền vào để
+    chọn sức chứa, chính sách loại bỏ và đọc thống kê sau khi giải (cũng
+    có trong stats.to_dict()["table"]). Sức chứa chỉ chặn bảng chuyển vị:
+    NodeStore và hàng đợi ưu tiên vẫn lớn theo số nút sinh ra, nên A* vẫn
+    có thể hết bộ nhớ; cần chặn bộ nhớ thì dùng IDA*.
+    stats: SearchStats được cập nhật trong lúc giải (đọc được từ luồng khác);
+    None thì không đo đạc gì.
+    cancel: đối tượng kiểu threading.Event; khi được set thì dừng và trả về None.
+    heuristic: tên heuristic truyền cho make_estimator.
+    macros: chỉ với mode="push", gộp các đoạn đẩy qua đường hầm và vào phòng
+    đích thành một nút (xem macros.py); chi phí vẫn tính theo số cú đẩy.
+    patterns: PatternStore các mẫu deadlock nhiều thùng; mẫu mới học được
+    được thêm vào đó (gọi patterns.save() để ghi ra file).
+    """
+    # Khởi tạo phần tĩnh của level một lần duy nhất
+    level = as_level(initial_grid)
+    if level.initial_player < 0:
         return None
-    
-    # Priority queue: (f_score, g_score, grid, player_pos, boxes, path)
+    successors = SUCCESSORS[mode]
+    analysis = None
+    if macros:
+        if mode != "push":
+            raise ValueError("Macro chỉ dùng được với mode push")
+        from macros import MacroAnalysis
+        analysis = MacroAnalysis(level)
+        successors = analysis.successors
+    # Các trạng thái con bị deadlock bị loại trước khi băm hay đưa vào heap
+    detector = DeadlockDetector(level, patterns)
+    estimator = make_estimator(level, heuristic)
+    zobrist = Zobrist(level)
+    if table is None:
+        table = TranspositionTable()
+    if stats is not None:
+        successors = stats.timed_successors(successors)
+        estimator = stats.timed_heuristic(estimator)
+        stats.track_table(table)
+
+    initial_player = level.initial_player
+    initial_boxes = level.initial_boxes
+    if mode == "push":
+        initial_player = normalize_player(level.reachable(initial_player, initial_boxes))
+    initial_h = estimator.evaluate(initial_boxes)
+    if initial_h is None:
+        return None
+
+    # Priority queue: (f_score, h, g_score, node)
+    # Cùng f thì ưu tiên h nhỏ hơn (gần đích hơn)
+    nodes = NodeStore()
     open_set = []
-    heapq.heappush(open_set, (0, 0, initial_grid, initial_player, initial_boxes, []))
-    
-    # Đã thăm
-    visited = set()
-    visited.add(state_to_key(initial_player, initial_boxes))
-    
-    # Các hướng di chuyển
-    directions = [(0, -1, 'U'), (0, 1, 'D'), (-1, 0, 'L'), (1, 0, 'R')]
-    
+    initial_key = zobrist.hash(initial_player, initial_boxes)
+    heapq.heappush(open_set, (initial_h, initial_h, 0,
+                              nodes.add(-1, -1, initial_player, initial_boxes, initial_key)))
+
+    # Đã thăm: khoá Zobrist -> g tốt nhất
+    table.offer(initial_key, 0)
+
     while open_set:
-        f_score, g_score, grid, player_pos, boxes, path = heapq.heappop(open_set)
-        
+        f_score, h, g_score, node = heapq.heappop(open_set)
+        player = nodes.players[node]
+        boxes = nodes.boxes[node]
+        key = nodes.keys[node]
+
+        # Bỏ qua nút cũ nếu trạng thái đã được mở lại với g nhỏ hơn
+        best_g = table.get(key)
+        if best_g is not None and best_g < g_score:
+            continue
+
+        if cancel is not None and cancel.is_set():
+            return None
+        if stats is not None:
+            stats.expand(f_score, len(open_set))
+
         # Kiểm tra goal state
-        if is_goal_state(boxes, goals):
-            return path
-        
+        if level.is_solved(boxes):
+            return path_to_moves(level, mode, nodes.path(node), analysis)
+
         # Thử các nước đi
-        for dx, dy, direction in directions:
-            new_grid, new_player = apply_move(grid, player_pos, dx, dy)
-            
-            if new_grid is None:
+        for new_player, new_boxes, push, move_code in successors(level, player, boxes, detector):
+            new_key = zobrist.child(key, player, new_player, push)
+            new_g = g_score + (1 if analysis is None else analysis.cost(move_code))
+
+            # Bỏ qua nếu đã thăm với chi phí không lớn hơn
+            if not table.offer(new_key, new_g):
+                if stats is not None:
+                    stats.duplicates += 1
                 continue
-            
-            new_boxes = get_boxes(new_grid)
-            state_key = state_to_key(new_player, new_boxes)
-            
-            # Bỏ qua nếu đã thăm
-            if state_key in visited:
-                continue
-            
-            visited.add(state_key)
-            
-            # Tính điểm
-            new_g = g_score + 1
-            h = heuristic(new_boxes, goals)
-            new_f = new_g + h
-            
+
+            # Tính điểm: chỉ cập nhật heuristic khi có thùng bị đẩy
+            new_h = h
+            if push is not None:
+                new_h = estimator.update(boxes, push[0], push[1], new_boxes)
+                if new_h is None:
+                    continue
+            new_f = new_g + new_h
+
             # Thêm vào queue
-            new_path = path + [direction]
-            heapq.heappush(open_set, (new_f, new_g, new_grid, new_player, new_boxes, new_path))
-    
+            child = nodes.add(node, move_code, new_player, new_boxes, new_key)
+            heapq.heappush(open_set, (new_f, new_h, new_g, child))
+            if stats is not None:
+                stats.generated += 1
+
     return None  # Không tìm thấy giải pháp
 
 def solve_level_1():
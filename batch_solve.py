@@ -0,0 +1,248 @@
+"""
+Giải hàng loạt level bằng nhiều tiến trình, ghi kết quả dạng JSON Lines
+
+Ví dụ:
+    python batch_solve.py -o results.jsonl --workers 8 --time-limit 120 --memory-limit 2048
+    python batch_solve.py -o results.jsonl --resume   # chạy tiếp phần còn lại
+    python batch_solve.py --collection microban.xsb    # giải một file bộ level chuẩn
+    python batch_solve.py --algorithm auto --memory-limit 1024   # A*, hết bộ nhớ thì chuyển IDA*
+    python batch_solve.py --algorithm anytime --time-limit 10    # lời giải tốt nhất trong 10 giây
+    python batch_solve.py --macros                                # gộp cú đẩy qua đường hầm/phòng đích
+    python batch_solve.py --deadlock-patterns                     # học và dùng lại mẫu deadlock nhiều thùng
+"""
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+
+from anytime_solver import anytime_search
+from astar_solver import HEURISTICS
+from board import Level
+from deadlock_patterns import DEFAULT_PATH, PatternStore
+from level_reader import iter_levels
+from levels import LEVELS
+from search_stats import SearchStats
+from solution_cache import SolutionCache
+from solvers import SOLVERS, solve
+
+class Deadline:
+    """Giả lập threading.Event: is_set() trả về True khi hết giờ"""
+
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds if seconds else None
+
+    def is_set(self):
+        return self.expires is not None and time.monotonic() > self.expires
+
+def limit_memory(memory_mb):
+    """Giới hạn bộ nhớ ảo của tiến trình con (chỉ có trên Unix)"""
+    if not memory_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    limit = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def solve_one(task):
+    """Giải một level trong tiến trình con, trả về bản ghi kết quả
+
+    algorithm="auto": chạy A*, nếu hết bộ nhớ thì giải lại bằng IDA* trong
+    thời gian còn lại.
+    """
+    level_id, rows, mode, time_limit, algorithm, heuristic, macros, patterns_path = task
+    grid = [list(row) for row in rows]
+    stats = SearchStats()
+    deadline = Deadline(time_limit)
+    record = {"level": level_id, "mode": mode, "algorithm": algorithm}
+    options = {"heuristic": heuristic}
+    if macros:
+        options["macros"] = True
+        record["macros"] = True
+    store = None
+    if patterns_path:
+        # Đọc lại file mỗi level để thấy các mẫu tiến trình khác vừa ghi thêm
+        store = PatternStore(patterns_path)
+        options["patterns"] = store
+    try:
+        if algorithm == "auto":
+            record["algorithm"] = "astar"
+            try:
+                solution = solve(grid, "astar", mode=mode, stats=stats, cancel=deadline, **options)
+            except MemoryError:
+                record["algorithm"] = "ida"
+            # Gọi IDA* ngoài khối except: traceback còn giữ hàng đợi của A*
+            if record["algorithm"] == "ida":
+                solution = solve(grid, "ida", mode=mode, stats=stats, cancel=deadline, **options)
+        elif algorithm == "anytime":
+            # Hết giờ vẫn trả về lời giải tốt nhất đã có, kèm hệ số chứng minh được
+            solution, bound = anytime_search(grid, mode, stats=stats, cancel=deadline, **options)
+            record["bound"] = round(bound, 4) if bound is not None else None
+        else:
+            solution = solve(grid, algorithm, mode=mode, stats=stats, cancel=deadline, **options)
+    except MemoryError:
+        solution = None
+        record["status"] = "memory"
+    else:
+        if solution is not None:
+            record["status"] = "solved"
+            if record.get("bound", 1.0) != 1.0:
+                record["status"] = "suboptimal"
+        elif deadline.is_set():
+            record["status"] = "timeout"
+        else:
+            record["status"] = "unsolvable"
+    stats.finish()
+    if store is not None:
+        record["patterns_learned"] = store.save()
+    record["solution"] = "".join(solution) if solution else None
+    record["length"] = len(solution) if solution else None
+    record["nodes"] = stats.expanded
+    record["generated"] = stats.generated
+    record["time"] = round(stats.elapsed(), 3)
+    record["stats"] = stats.to_dict()
+    return record
+
+def load_done(path):
+    """Tập level đã có kết quả trong file output (để chạy tiếp)"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                done.add(json.loads(line)["level"])
+            except (ValueError, KeyError):
+                # Dòng cuối có thể bị cắt dở khi lần chạy trước bị ngắt
+                continue
+    return done
+
+def trim_partial_line(path):
+    """Cắt bỏ dòng cuối bị ghi dở (file không kết thúc bằng xuống dòng) để ghi nối tiếp an toàn"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        # Đọc ngược từng đoạn tới ký tự xuống dòng gần cuối nhất
+        while pos > 0:
+            start = max(0, pos - 4096)
+            f.seek(start)
+            chunk = f.read(pos - start)
+            if pos == end and chunk.endswith(b"\n"):
+                return
+            newline = chunk.rfind(b"\n")
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            pos = start
+        f.truncate(0)
+
+def write_record(out, record):
+    """Ghi một dòng kết quả và đẩy xuống đĩa ngay"""
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    out.flush()
+    print(f"Level {record['level']}: {record['status']} "
+          f"({record['length']} bước, {record['nodes']} nút, {record['time']}s)")
+
+def run_batch(levels, output, workers=None, mode="push", time_limit=60,
+              memory_limit=None, resume=False, cache_path=None, algorithm="astar",
+              heuristic="matching", macros=False, patterns_path=None):
+    """Giải các level (danh sách (id, rows)), ghi từng dòng JSON ngay khi xong"""
+    if resume:
+        trim_partial_line(output)
+    done = load_done(output) if resume else set()
+    tasks = [(level_id, rows, mode, time_limit, algorithm, heuristic, macros, patterns_path)
+             for level_id, rows in levels if level_id not in done]
+    if not tasks:
+        print("Không còn level nào cần giải")
+        return
+    cache = SolutionCache(cache_path) if cache_path else None
+    print(f"Giải {len(tasks)} level ({len(done)} đã xong) bằng {workers or os.cpu_count()} tiến trình...")
+
+    file_mode = "a" if resume else "w"
+    with open(output, file_mode, encoding="utf-8") as out:
+        if cache is not None:
+            # Level đã có trong cache thì ghi ngay, không cần giải lại
+            remaining = []
+            for task in tasks:
+                level_id, rows = task[0], task[1]
+                solution = cache.get([list(row) for row in rows], mode)
+                if solution is None:
+                    remaining.append(task)
+                    continue
+                write_record(out, {"level": level_id, "mode": mode, "status": "solved",
+                                   "solution": "".join(solution), "length": len(solution),
+                                   "nodes": 0, "generated": 0, "time": 0.0, "cached": True})
+            tasks = remaining
+        rows_by_id = {task[0]: task[1] for task in tasks}
+        if heuristic == "pdb":
+            # Dựng bảng trước khi chia việc: các tiến trình con chỉ mmap file đã có
+            from pattern_db import build
+            for task in tasks:
+                build(Level([list(row) for row in task[1]]))
+        # maxtasksperchild=1: mỗi level chạy trong tiến trình mới, bộ nhớ được trả lại sau mỗi level
+        with Pool(workers, initializer=limit_memory, initargs=(memory_limit,),
+                  maxtasksperchild=1) as pool:
+            for record in pool.imap_unordered(solve_one, tasks):
+                write_record(out, record)
+                # Lời giải dùng macro có thể không tối ưu: không ghi vào cache
+                if cache is not None and record["status"] == "solved" and not macros:
+                    grid = [list(row) for row in rows_by_id[record["level"]]]
+                    cache.put(grid, mode, list(record["solution"]))
+    if cache is not None:
+        cache.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Giải hàng loạt level Sokoban")
+    parser.add_argument("-o", "--output", default="results.jsonl",
+                        help="File kết quả JSON Lines")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Số tiến trình (mặc định: số lõi CPU)")
+    parser.add_argument("--mode", choices=("move", "push"), default="push",
+                        help="Chế độ tìm kiếm của A*")
+    parser.add_argument("--algorithm", choices=sorted(SOLVERS) + ["auto"], default="astar",
+                        help="Thuật toán giải (auto: A*, hết bộ nhớ thì chuyển IDA*; bidir chỉ với --mode push)")
+    parser.add_argument("--heuristic", choices=HEURISTICS, default="matching",
+                        help="Heuristic (pdb: thêm pattern database các cặp thùng)")
+    parser.add_argument("--macros", action="store_true",
+                        help="Gộp các cú đẩy qua đường hầm và vào phòng đích (chỉ astar, --mode push)")
+    parser.add_argument("--deadlock-patterns", metavar="FILE", nargs="?", const=DEFAULT_PATH,
+                        help="Học mẫu deadlock nhiều thùng và dùng lại giữa các lần chạy "
+                             "(mặc định: pattern_dbs/deadlock_patterns.txt)")
+    parser.add_argument("--time-limit", type=float, default=60,
+                        help="Giới hạn thời gian mỗi level (giây, 0 = không giới hạn)")
+    parser.add_argument("--memory-limit", type=int, default=None,
+                        help="Giới hạn bộ nhớ mỗi tiến trình (MB)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Bỏ qua các level đã có trong file kết quả")
+    parser.add_argument("--collection", metavar="FILE",
+                        help="File bộ level XSB/SOK (mặc định: các level của game)")
+    parser.add_argument("--cache", metavar="FILE",
+                        help="Dùng và cập nhật cache lời giải SQLite")
+    args = parser.parse_args()
+    if args.algorithm == "bidir" and args.mode != "push":
+        parser.error("--algorithm bidir chỉ dùng được với --mode push")
+    if args.macros and (args.algorithm != "astar" or args.mode != "push"):
+        parser.error("--macros chỉ dùng được với --algorithm astar --mode push")
+    if args.algorithm == "hda":
+        parser.error("--algorithm hda tự tạo nhiều tiến trình, không chạy được trong pool; "
+                     "dùng python hda_solver.py")
+
+    if args.collection:
+        levels = [(i + 1, rows) for i, (_, rows) in enumerate(iter_levels(args.collection))]
+    else:
+        levels = [(i + 1, rows) for i, rows in enumerate(LEVELS)]
+    run_batch(levels, args.output, workers=args.workers, mode=args.mode,
+              time_limit=args.time_limit, memory_limit=args.memory_limit,
+              resume=args.resume, cache_path=args.cache, algorithm=args.algorithm,
+              heuristic=args.heuristic, macros=args.macros,
+              patterns_path=args.deadlock_patterns)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Bộ benchmark cho bộ giải A* và cổng kiểm tra hồi quy hiệu năng
+
+Ví dụ:
+    python benchmark.py --save baseline.json            # ghi kết quả làm mốc
+    python benchmark.py --compare baseline.json         # thoát mã 1 nếu chậm đi quá ngưỡng
+    python benchmark.py --compare baseline.json --threshold 0.25 --repeat 3
+    python benchmark.py --hda-workers 1 2 4 8 --save hda.json   # HDA* so với A*
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from multiprocessing import Pool
+
+from astar_solver import HEURISTICS, astar_solve
+from batch_solve import solve_one
+from board import Level
+from hda_solver import hda_solve
+from solution_optimizer import solution_pushes
+from solvers import SOLVERS
+from levels import LEVELS
+
+# Các level chuẩn khó hơn đi kèm để đo hiệu năng
+BENCHMARK_LEVELS = [
+    ("microban-1", [
+        "####",
+        "# .#",
+        "#  ###",
+        "#*@  #",
+        "#  $ #",
+        "#  ###",
+        "####",
+    ]),
+    ("microban-2", [
+        "######",
+        "#    #",
+        "# #@ #",
+        "# $* #",
+        "# .* #",
+        "#    #",
+        "######",
+    ]),
+    ("microban-3", [
+        "  ####",
+        "###  ####",
+        "#     $ #",
+        "# #  #$ #",
+        "# . .#@ #",
+        "#########",
+    ]),
+    ("microban-4", [
+        "########",
+        "#      #",
+        "# .**$@#",
+        "#      #",
+        "#####  #",
+        "    ####",
+    ]),
+    ("microban-5", [
+        " #######",
+        " #     #",
+        " # .$. #",
+        "## $@$ #",
+        "#  .$. #",
+        "#      #",
+        "########",
+    ]),
+    ("original-1", [
+        "    #####",
+        "    #   #",
+        "    #$  #",
+        "  ###  $##",
+        "  #  $ $ #",
+        "### # ## #   ######",
+        "#   # ## #####  ..#",
+        "# $  $          ..#",
+        "##### ### #@##  ..#",
+        "    #     #########",
+        "    #######",
+    ]),
+]
+
+# Chỉ số và hướng "tốt hơn": +1 nếu lớn hơn là tốt, -1 nếu nhỏ hơn là tốt
+METRICS = {
+    "time": -1,
+    "nodes": -1,
+    "generated": -1,
+    "nodes_per_sec": 1,
+    "peak_rss_kb": -1,
+}
+# Level chạy nhanh hơn mức này thì không so sánh thời gian (nhiễu đo quá lớn)
+MIN_TIME = 0.05
+
+def corpus():
+    """Danh sách (tên, rows) gồm các level của game và các level chuẩn đi kèm"""
+    levels = [(f"game-{i + 1}", rows) for i, rows in enumerate(LEVELS)]
+    return levels + BENCHMARK_LEVELS
+
+def measure(task):
+    """Chạy một level trong tiến trình riêng và đo thêm bộ nhớ đỉnh"""
+    import resource
+    record = solve_one(task)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak //= 1024  # macOS trả về byte, Linux trả về KB
+    record["peak_rss_kb"] = peak
+    record["nodes_per_sec"] = round(record["nodes"] / record["time"]) if record["time"] else 0
+    return record
+
+def run_benchmark(mode="push", repeat=1, time_limit=300, algorithm="astar",
+                  heuristic="matching", macros=False):
+    """Chạy toàn bộ corpus, trả về {tên level: chỉ số}; lấy lần chạy nhanh nhất"""
+    results = {}
+    # Chạy tuần tự, mỗi lần một tiến trình mới để thời gian và RSS không lẫn nhau
+    with Pool(1, maxtasksperchild=1) as pool:
+        for name, rows in corpus():
+            best = None
+            for _ in range(repeat):
+                # Không dùng file mẫu deadlock đã học để các lần đo không phụ thuộc nhau
+                task = (name, rows, mode, time_limit, algorithm, heuristic, macros, None)
+                record = pool.apply(measure, (task,))
+                if best is None or record["time"] < best["time"]:
+                    best = record
+            results[name] = {
+                "status": best["status"],
+                "length": best["length"],
+                "time": best["time"],
+                "nodes": best["nodes"],
+                "generated": best["generated"],
+                "nodes_per_sec": best["nodes_per_sec"],
+                "peak_rss_kb": best["peak_rss_kb"],
+                "stats": best["stats"],
+            }
+            print(f"{name:12} {best['status']:10} time {best['time']:8.3f}s  "
+                  f"nodes {best['nodes']:8}  gen {best['generated']:8}  "
+                  f"{best['nodes_per_sec']:8} n/s  rss {best['peak_rss_kb']} KB")
+    return results
+
+def solution_cost(level, mode, solution):
+    """Số cú đẩy (mode push) hoặc số bước (mode move) của lời giải; None nếu không giải được"""
+    if solution is None:
+        return None
+    return len(solution_pushes(level, solution)) if mode == "push" else len(solution)
+
+def run_hda_scaling(worker_counts, mode="push", heuristic="matching"):
+    """Đo HDA* với từng số tiến trình so với A* trên toàn bộ corpus.
+
+    Chạy ngay trong tiến trình chính (HDA* cần tạo tiến trình con, Pool daemon
+    không cho phép). Trả về ({tên level: chỉ số}, danh sách level mà HDA* cho
+    lời giải khác chi phí A*).
+    """
+    results = {}
+    mismatches = []
+    for name, rows in corpus():
+        level = Level([list(row) for row in rows])
+        start = time.perf_counter()
+        reference = solution_cost(level, mode, astar_solve(level, mode, heuristic=heuristic))
+        astar_time = time.perf_counter() - start
+        entry = {"astar": {"time": round(astar_time, 4), "cost": reference}, "hda": {}}
+        line = f"{name:12} astar {astar_time:8.3f}s ({reference})"
+        for workers in worker_counts:
+            start = time.perf_counter()
+            cost = solution_cost(level, mode, hda_solve(level, mode, workers, heuristic=heuristic))
+            elapsed = time.perf_counter() - start
+            entry["hda"][str(workers)] = {
+                "time": round(elapsed, 4),
+                "cost": cost,
+                "speedup": round(astar_time / elapsed, 2) if elapsed else None,
+            }
+            line += f"  hda×{workers} {elapsed:8.3f}s ({cost})"
+            if cost != reference:
+                mismatches.append(f"{name}: hda×{workers} {cost} != astar {reference}")
+        results[name] = entry
+        print(line)
+    return results, mismatches
+
+def compare(baseline, current, threshold, metrics):
+    """Danh sách các hồi quy vượt ngưỡng so với baseline"""
+    regressions = []
+    for name, old in baseline["levels"].items():
+        new = current.get(name)
+        if new is None:
+            continue
+        if old["status"] == "solved" and new["status"] != "solved":
+            regressions.append(f"{name}: {old['status']} -> {new['status']}")
+            continue
+        for metric in metrics:
+            before, after = old.get(metric), new.get(metric)
+            if not before or after is None:
+                continue
+            if metric in ("time", "nodes_per_sec") and old["time"] < MIN_TIME:
+                continue
+            change = (after - before) / before * -METRICS[metric]
+            if change > threshold:
+                regressions.append(f"{name}: {metric} {before} -> {after} "
+                                   f"({change:+.0%} tệ hơn, ngưỡng {threshold:.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bộ giải Sokoban")
+    parser.add_argument("--mode", choices=("move", "push"), default="push")
+    parser.add_argument("--algorithm", choices=sorted(SOLVERS), default="astar")
+    parser.add_argument("--heuristic", choices=HEURISTICS, default="matching")
+    parser.add_argument("--macros", action="store_true",
+                        help="Gộp các cú đẩy qua đường hầm và vào phòng đích (chỉ astar, --mode push)")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Số lần chạy mỗi level (lấy lần nhanh nhất)")
+    parser.add_argument("--time-limit", type=float, default=300,
+                        help="Giới hạn thời gian mỗi level (giây)")
+    parser.add_argument("--save", metavar="FILE", help="Ghi kết quả làm baseline")
+    parser.add_argument("--compare", metavar="FILE", help="So sánh với baseline")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Tỉ lệ tệ đi tối đa cho phép (0.10 = 10%%)")
+    parser.add_argument("--metrics", nargs="+", choices=sorted(METRICS),
+                        default=sorted(METRICS), help="Các chỉ số dùng để so sánh")
+    parser.add_argument("--hda-workers", type=int, nargs="+", metavar="N",
+                        help="Đo HDA* với các số tiến trình này so với A* (thoát mã 1 "
+                             "nếu chi phí lời giải khác A*)")
+    args = parser.parse_args()
+    if args.hda_workers:
+        if args.compare:
+            parser.error("--hda-workers không dùng với --compare")
+        cpus = os.cpu_count() or 1
+        if max(args.hda_workers) > cpus:
+            print(f"Cảnh báo: máy chỉ có {cpus} lõi, số tiến trình lớn hơn không thể nhanh hơn")
+        results, mismatches = run_hda_scaling(args.hda_workers, args.mode, args.heuristic)
+        if args.save:
+            report = {
+                "mode": args.mode,
+                "heuristic": args.heuristic,
+                "cpus": cpus,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "hda_scaling": results,
+            }
+            with open(args.save, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"Đã lưu kết quả vào {args.save}")
+        if mismatches:
+            print("HDA* cho lời giải khác chi phí A*:")
+            for line in mismatches:
+                print("  " + line)
+            sys.exit(1)
+        print("HDA* cho cùng chi phí lời giải với A* trên mọi level")
+        return
+    if args.algorithm == "bidir" and args.mode != "push":
+        parser.error("--algorithm bidir chỉ dùng được với --mode push")
+    if args.macros and (args.algorithm != "astar" or args.mode != "push"):
+        parser.error("--macros chỉ dùng được với --algorithm astar --mode push")
+    if args.algorithm == "hda":
+        parser.error("--algorithm hda tự tạo nhiều tiến trình, không chạy được trong pool; "
+                     "dùng --hda-workers")
+
+    results = run_benchmark(args.mode, args.repeat, args.time_limit, args.algorithm, args.heuristic,
+                            args.macros)
+    report = {
+        "mode": args.mode,
+        "algorithm": args.algorithm,
+        "heuristic": args.heuristic,
+        "macros": args.macros,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "levels": results,
+    }
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Đã lưu baseline vào {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("mode") != args.mode:
+            print(f"Cảnh báo: baseline dùng mode {baseline.get('mode')}, đang chạy {args.mode}")
+        if baseline.get("algorithm", "astar") != args.algorithm:
+            print(f"Cảnh báo: baseline dùng {baseline.get('algorithm', 'astar')}, đang chạy {args.algorithm}")
+        if baseline.get("heuristic", "matching") != args.heuristic:
+            print(f"Cảnh báo: baseline dùng heuristic {baseline.get('heuristic', 'matching')}, "
+                  f"đang chạy {args.heuristic}")
+        if baseline.get("macros", False) != args.macros:
+            print(f"Cảnh báo: baseline dùng macros={baseline.get('macros', False)}, "
+                  f"đang chạy macros={args.macros}")
+        regressions = compare(baseline, results, args.threshold, args.metrics)
+        if regressions:
+            print("Hiệu năng bị hồi quy:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print("Không có hồi quy vượt ngưỡng")
+
+if __name__ == "__main__":
+    main()
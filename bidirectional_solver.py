@@ -0,0 +1,167 @@
+"""
+Tìm kiếm hai chiều cho Sokoban: đẩy thùng từ trạng thái đầu, kéo thùng từ đích
+
+Chiều xuôi mở rộng các cú đẩy như astar_solve(mode="push"). Chiều ngược bắt
+đầu từ cấu hình mọi thùng nằm trên đích; vì không biết người chơi kết thúc ở
+đâu nên mỗi vùng sàn liên thông của cấu hình đó là một trạng thái gốc.
+
+Mỗi chiều là một A* riêng: chiều xuôi xếp theo ghép cặp thùng-đích, chiều
+ngược theo ghép cặp thùng với vị trí ban đầu (số cú kéo), tức là hướng về
+gốc của chiều kia. Mỗi lượt mở rộng một nút của chiều có biên nhỏ hơn. Hai
+chiều gặp nhau khi một chiều sinh ra trạng thái chiều kia đã có; tìm kiếm
+dừng khi lời giải tốt nhất không dài hơn f nhỏ nhất của một trong hai biên,
+nên lời giải có số cú đẩy ít nhất.
+"""
+import heapq
+
+from astar_solver import NodeStore, astar_solve, make_estimator, path_to_moves, push_successors
+from board import OPPOSITE, as_level, iter_cells, normalize_player
+from deadlock import DeadlockDetector
+from heuristics import MatchingHeuristic, pull_distances
+from transposition import Zobrist
+
+FORWARD = 0
+BACKWARD = 1
+
+def box_reachable_cells(level):
+    """Bitmask các ô mà ít nhất một thùng ban đầu có thể bị đẩy tới (bỏ qua thùng khác)"""
+    seen = level.initial_boxes
+    stack = list(iter_cells(level.initial_boxes))
+    while stack:
+        cell = stack.pop()
+        for d, target in enumerate(level.neighbors[cell]):
+            if target < 0 or seen >> target & 1 or level.neighbors[cell][OPPOSITE[d]] < 0:
+                continue
+            seen |= 1 << target
+            stack.append(target)
+    return seen
+
+def pull_successors(level, player, boxes, allowed):
+    """Sinh trạng thái cha theo từng cú kéo thùng (cú đẩy ngược).
+
+    Người chơi đứng ở ô p cạnh thùng b, lùi sang ô q phía sau và kéo thùng
+    vào p. Mã trả về là cú đẩy xuôi tương ứng (thùng ở p, hướng từ p về b).
+    """
+    region = level.reachable(player, boxes)
+    for box in iter_cells(boxes):
+        for d in range(4):
+            stand = level.neighbors[box][d]
+            if stand < 0 or not region >> stand & 1:
+                continue
+            back = level.neighbors[stand][d]
+            if back < 0 or boxes >> back & 1 or not allowed >> stand & 1:
+                continue
+            new_boxes = boxes ^ (1 << box) ^ (1 << stand)
+            new_player = normalize_player(level.reachable(back, new_boxes))
+            yield new_player, new_boxes, (box, stand), stand * 4 + OPPOSITE[d]
+
+def free_regions(level, boxes):
+    """Ô đại diện của từng vùng sàn liên thông khi thùng nằm ở boxes"""
+    free = ((1 << len(level.cells)) - 1) & ~boxes
+    players = []
+    while free:
+        region = level.reachable(normalize_player(free), boxes)
+        players.append(normalize_player(region))
+        free &= ~region
+    return players
+
+def bidirectional_solve(initial_grid, mode="push", stats=None, cancel=None,
+                        heuristic="matching", patterns=None):
+    """Giải Sokoban bằng tìm kiếm hai chiều theo cú đẩy.
+
+    Chỉ hỗ trợ mode="push"; lời giải trả về là chuỗi bước U/D/L/R như
+    astar_solve. Level có nhiều đích hơn thùng (cấu hình đích không duy
+    nhất) được giải bằng A* một chiều.
+    heuristic, patterns: như astar_solve, chỉ áp dụng cho chiều xuôi; chiều
+    ngược luôn ghép cặp thùng với vị trí ban đầu.
+    """
+    if mode != "push":
+        raise ValueError("Tìm kiếm hai chiều chỉ hỗ trợ mode='push'")
+    level = as_level(initial_grid)
+    if level.initial_player < 0:
+        return None
+    if bin(level.initial_boxes).count("1") != len(level.goal_cells):
+        return astar_solve(initial_grid, mode="push", stats=stats, cancel=cancel,
+                           heuristic=heuristic, patterns=patterns)
+    if level.is_solved(level.initial_boxes):
+        return []
+    detector = DeadlockDetector(level, patterns)
+    zobrist = Zobrist(level)
+    allowed = box_reachable_cells(level)
+    # Chiều xuôi hướng về cấu hình đích, chiều ngược hướng về cấu hình ban đầu
+    estimators = (make_estimator(level, heuristic),
+                  MatchingHeuristic(level, distances=pull_distances(level)))
+    forward_successors = push_successors
+    backward_successors = pull_successors
+    if stats is not None:
+        forward_successors = stats.timed_successors(forward_successors)
+        backward_successors = stats.timed_successors(backward_successors)
+        estimators = tuple(stats.timed_heuristic(estimator) for estimator in estimators)
+
+    stores = (NodeStore(), NodeStore())
+    # Mỗi chiều một bảng: khoá Zobrist -> (g tốt nhất, nút)
+    tables = ({}, {})
+    # Priority queue mỗi chiều: (f_score, h, g_score, node)
+    open_sets = ([], [])
+    roots = [(FORWARD, normalize_player(level.reachable(level.initial_player, level.initial_boxes)),
+              level.initial_boxes)]
+    roots += [(BACKWARD, player, level.goals) for player in free_regions(level, level.goals)]
+    for side, player, boxes in roots:
+        h = estimators[side].evaluate(boxes)
+        if h is None:
+            return None
+        key = zobrist.hash(player, boxes)
+        node = stores[side].add(-1, -1, player, boxes, key)
+        tables[side][key] = (0, node)
+        heapq.heappush(open_sets[side], (h, h, 0, node))
+
+    # Lời giải tốt nhất đã thấy: (số cú đẩy, nút chiều xuôi, nút chiều ngược)
+    best = None
+    while open_sets[FORWARD] and open_sets[BACKWARD]:
+        # f nhỏ nhất mỗi chiều là cận dưới cho mọi lời giải chưa thấy (điều kiện dừng của Pohl)
+        if best is not None and best[0] <= max(open_sets[FORWARD][0][0], open_sets[BACKWARD][0][0]):
+            break
+        # Mở rộng chiều có biên nhỏ hơn
+        side = FORWARD if len(open_sets[FORWARD]) <= len(open_sets[BACKWARD]) else BACKWARD
+        store, table, estimator = stores[side], tables[side], estimators[side]
+        f_score, h, g_score, node = heapq.heappop(open_sets[side])
+        player, boxes, key = store.players[node], store.boxes[node], store.keys[node]
+        # Bỏ qua nút cũ nếu trạng thái đã được mở lại với g nhỏ hơn
+        if table[key][0] < g_score:
+            continue
+        if cancel is not None and cancel.is_set():
+            return None
+        if stats is not None:
+            stats.expand(f_score, len(open_sets[FORWARD]) + len(open_sets[BACKWARD]))
+        if side == FORWARD:
+            children = forward_successors(level, player, boxes, detector)
+        else:
+            children = backward_successors(level, player, boxes, allowed)
+        for new_player, new_boxes, push, code in children:
+            new_key = zobrist.child(key, player, new_player, push)
+            new_g = g_score + 1
+            old = table.get(new_key)
+            if old is not None and old[0] <= new_g:
+                if stats is not None:
+                    stats.duplicates += 1
+                continue
+            new_h = estimator.update(boxes, push[0], push[1], new_boxes)
+            if new_h is None:
+                continue
+            child = store.add(node, code, new_player, new_boxes, new_key)
+            table[new_key] = (new_g, child)
+            heapq.heappush(open_sets[side], (new_g + new_h, new_h, new_g, child))
+            if stats is not None:
+                stats.generated += 1
+            # Hai chiều gặp nhau: ghi nhận lời giải, dừng khi không còn lời giải nào ngắn hơn
+            other = tables[1 - side].get(new_key)
+            if other is not None and (best is None or new_g + other[0] < best[0]):
+                if side == FORWARD:
+                    best = (new_g + other[0], child, other[1])
+                else:
+                    best = (new_g + other[0], other[1], child)
+    if best is None:
+        return None  # Không tìm thấy giải pháp
+    _, forward_node, backward_node = best
+    pushes = stores[FORWARD].path(forward_node) + stores[BACKWARD].path(backward_node)[::-1]
+    return path_to_moves(level, "push", pushes)
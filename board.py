@@ -0,0 +1,173 @@
+"""
+Biểu diễn trạng thái Sokoban gọn nhẹ (bitboard) cho các thuật toán giải
+"""
+import copy
+from collections import deque
+
+# Các hướng di chuyển: (dx, dy, ký hiệu)
+DIRECTIONS = [(0, -1, 'U'), (0, 1, 'D'), (-1, 0, 'L'), (1, 0, 'R')]
+# Chỉ số hướng ngược lại của từng hướng
+OPPOSITE = [1, 0, 3, 2]
+
+def iter_cells(mask):
+    """Duyệt chỉ số các bit đang bật trong mask"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def normalize_player(region):
+    """Ô đại diện (chỉ số nhỏ nhất) của vùng người chơi"""
+    return (region & -region).bit_length() - 1
+
+class Level:
+    """Phần tĩnh của một level: tường, đích và bảng chỉ số ô.
+
+    Mỗi trạng thái tìm kiếm chỉ gồm (player, boxes): player là chỉ số ô
+    của người chơi, boxes là số nguyên có bit thứ i bật nếu ô i có thùng.
+    """
+
+    def __init__(self, grid):
+        self.height = len(grid)
+        self.width = max((len(row) for row in grid), default=0)
+
+        def char_at(x, y):
+            if y < 0 or y >= self.height or x < 0 or x >= len(grid[y]):
+                return "#"
+            return grid[y][x]
+
+        player = None
+        box_positions = []
+        goal_positions = []
+        for y, row in enumerate(grid):
+            for x, c in enumerate(row):
+                if c in ("@", "+"):
+                    player = (x, y)
+                if c in ("$", "*"):
+                    box_positions.append((x, y))
+                if c in (".", "+", "*"):
+                    goal_positions.append((x, y))
+
+        # Chỉ đánh số các ô người chơi có thể tới (bỏ qua thùng),
+        # nhờ vậy phần sàn bên ngoài tường không chiếm bit nào
+        stack = [player] if player else []
+        stack.extend(box_positions + goal_positions)
+        seen = set(stack)
+        while stack:
+            x, y = stack.pop()
+            for dx, dy, _ in DIRECTIONS:
+                nxt = (x + dx, y + dy)
+                if nxt not in seen and char_at(*nxt) != "#":
+                    seen.add(nxt)
+                    stack.append(nxt)
+        # Sắp xếp theo hàng rồi cột để chỉ số ổn định
+        self.cells = sorted(seen, key=lambda pos: (pos[1], pos[0]))   # chỉ số -> (x, y)
+        self.index = {pos: i for i, pos in enumerate(self.cells)}   # (x, y) -> chỉ số
+
+        # neighbors[ô][hướng] = ô kề theo hướng đó, -1 nếu là tường
+        self.neighbors = []
+        for x, y in self.cells:
+            self.neighbors.append([self.index.get((x + dx, y + dy), -1)
+                                   for dx, dy, _ in DIRECTIONS])
+
+        self.goal_cells = [self.index[pos] for pos in goal_positions]
+        self.goals = 0
+        for cell in self.goal_cells:
+            self.goals |= 1 << cell
+        self.initial_player = self.index[player] if player else -1
+        self.initial_boxes = 0
+        for pos in box_positions:
+            self.initial_boxes |= 1 << self.index[pos]
+
+    def move(self, player, boxes, direction):
+        """Đi một bước theo hướng direction.
+
+        Trả về (player, boxes, pushed) mới, hoặc None nếu bị chặn.
+        """
+        target = self.neighbors[player][direction]
+        if target < 0:
+            return None
+        bit = 1 << target
+        if boxes & bit:
+            behind = self.neighbors[target][direction]
+            if behind < 0 or boxes >> behind & 1:
+                return None
+            return target, boxes ^ bit ^ (1 << behind), True
+        return target, boxes, False
+
+    def at(self, player, boxes):
+        """Bản sao dùng chung phần tĩnh, với trạng thái ban đầu là (player, boxes)"""
+        level = copy.copy(self)
+        level.initial_player = player
+        level.initial_boxes = boxes
+        return level
+
+    def is_solved(self, boxes):
+        """Kiểm tra mọi thùng đã nằm trên đích"""
+        return boxes & ~self.goals == 0
+
+    def box_positions(self, boxes):
+        """Danh sách toạ độ (x, y) các thùng, đã sắp xếp"""
+        return [self.cells[cell] for cell in iter_cells(boxes)]
+
+    def reachable(self, player, boxes):
+        """Bitmask các ô người chơi đi tới được mà không đẩy thùng"""
+        region = 1 << player
+        stack = [player]
+        while stack:
+            cell = stack.pop()
+            for nxt in self.neighbors[cell]:
+                if nxt >= 0 and not (region | boxes) >> nxt & 1:
+                    region |= 1 << nxt
+                    stack.append(nxt)
+        return region
+
+    def pushes(self, region, boxes):
+        """Sinh các cú đẩy (box, direction, new_boxes) từ vùng người chơi region"""
+        for box in iter_cells(boxes):
+            neighbors = self.neighbors[box]
+            for direction in range(4):
+                target = neighbors[direction]
+                if target < 0 or boxes >> target & 1:
+                    continue
+                stand = neighbors[OPPOSITE[direction]]
+                if stand < 0 or not region >> stand & 1:
+                    continue
+                yield box, direction, boxes ^ (1 << box) ^ (1 << target)
+
+    def walk_path(self, start, goal, boxes):
+        """Đường đi ngắn nhất (danh sách hướng) từ start tới goal, không đẩy thùng"""
+        if start == goal:
+            return []
+        came_from = {start: None}
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            for direction, nxt in enumerate(self.neighbors[cell]):
+                if nxt < 0 or nxt in came_from or boxes >> nxt & 1:
+                    continue
+                came_from[nxt] = (cell, direction)
+                if nxt == goal:
+                    path = []
+                    while came_from[nxt] is not None:
+                        nxt, direction = came_from[nxt]
+                        path.append(DIRECTIONS[direction][2])
+                    path.reverse()
+                    return path
+                queue.append(nxt)
+        return None
+
+    def pushes_to_moves(self, player, boxes, pushes):
+        """Đổi chuỗi cú đẩy (box, direction) thành chuỗi bước U/D/L/R đầy đủ"""
+        moves = []
+        for box, direction in pushes:
+            stand = self.neighbors[box][OPPOSITE[direction]]
+            moves.extend(self.walk_path(player, stand, boxes))
+            moves.append(DIRECTIONS[direction][2])
+            boxes ^= (1 << box) ^ (1 << self.neighbors[box][direction])
+            player = box
+        return moves
+
+def as_level(grid):
+    """Level của grid; nhận luôn một Level có sẵn (kể cả từ Level.at) mà không quét lại lưới"""
+    return grid if isinstance(grid, Level) else Level(grid)
@@ -0,0 +1,76 @@
+"""
+Phát hiện deadlock: ô chết tĩnh, thùng bị kẹt cứng (freeze) và các mẫu đã học
+"""
+from collections import deque
+
+from deadlock_patterns import PatternDeadlocks
+
+def compute_dead_squares(level):
+    """Tính bitmask các ô chết: đặt thùng vào đó thì không bao giờ tới được đích.
+
+    Kéo ngược thùng từ mọi đích (chỉ xét tường); ô nào thùng không được
+    kéo tới thì là ô chết.
+    """
+    live = level.goals
+    queue = deque(level.goal_cells)
+    while queue:
+        cell = queue.popleft()
+        for d in range(4):
+            # Người chơi đứng ở ô kề theo hướng d rồi lùi tiếp một ô, kéo thùng theo
+            nxt = level.neighbors[cell][d]
+            if nxt < 0 or live >> nxt & 1:
+                continue
+            if level.neighbors[nxt][d] < 0:
+                continue
+            live |= 1 << nxt
+            queue.append(nxt)
+    return ((1 << len(level.cells)) - 1) & ~live
+
+class DeadlockDetector:
+    """Kiểm tra nhanh một cú đẩy có tạo ra deadlock không.
+
+    patterns: PatternStore các mẫu deadlock nhiều thùng (học thêm trong lúc
+    giải); None thì chỉ dùng ô chết và kẹt cứng.
+    """
+
+    def __init__(self, level, patterns=None):
+        self.level = level
+        self.dead = compute_dead_squares(level)
+        self.patterns = PatternDeadlocks(level, patterns) if patterns is not None else None
+
+    def is_deadlock(self, boxes, box):
+        """True nếu thùng vừa được đẩy tới ô box làm level không thể giải"""
+        if self.dead >> box & 1:
+            return True
+        frozen = self._frozen_boxes(boxes, box, 0)
+        if frozen is not None and frozen & ~self.level.goals != 0:
+            return True
+        return self.patterns is not None and self.patterns.is_deadlock(boxes, box)
+
+    def _frozen_boxes(self, boxes, box, walls):
+        """Bitmask các thùng kẹt cứng cùng thùng box, None nếu box còn đẩy được.
+
+        walls là các thùng đang xét, được coi như tường để tránh lặp vô hạn.
+        """
+        neighbors = self.level.neighbors[box]
+        frozen = 1 << box
+        for first, second in ((2, 3), (0, 1)):
+            a, b = neighbors[first], neighbors[second]
+            # Bị tường chặn ở một phía
+            if a < 0 or b < 0 or walls >> a & 1 or walls >> b & 1:
+                continue
+            # Hai phía đều là ô chết: đẩy theo trục này cũng vô ích
+            if self.dead >> a & 1 and self.dead >> b & 1:
+                continue
+            # Bị một thùng kẹt cứng khác chặn
+            blocked = False
+            for other in (a, b):
+                if boxes >> other & 1:
+                    result = self._frozen_boxes(boxes, other, walls | (1 << box))
+                    if result is not None:
+                        frozen |= result
+                        blocked = True
+                        break
+            if not blocked:
+                return None
+        return frozen
@@ -0,0 +1,219 @@
+"""
+Học các mẫu deadlock nhiều thùng và lưu lại giữa các lần chạy
+
+Sau mỗi cú đẩy, xét ô 5x5 quanh thùng vừa đẩy (tường, đích, thùng). Mẫu
+được phân tích trong một thế giới nới lỏng: chỉ giữ các thùng trong ô, và
+vành ngoài ô là sàn trống mà thùng đẩy ra tới đó coi như đã xong. Nếu kể cả
+như vậy mà tìm kiếm vét cạn (từ mọi vùng người chơi) không đưa được các
+thùng vào đích, thì mọi level có cùng nội dung ô đó đều đã deadlock.
+
+Mẫu được phân tích chủ động khi ô xuất hiện lần đầu, không học từ các
+nhánh mà A* duyệt hết: A* mở rộng xen kẽ mọi nhánh theo f nên không có
+thời điểm một cây con "vét cạn xong", còn tìm kiếm cục bộ trên ô nhỏ thì
+rẻ và cho kết quả đúng với mọi level.
+
+Mẫu chỉ phụ thuộc nội dung ô (đã chuẩn hoá theo vị trí thùng), nên dùng
+chung được giữa các level. Chỉ mẫu deadlock được ghi nối vào file văn bản,
+mỗi dòng "1 <khoá hex>"; các tiến trình batch cùng đọc và ghi nối tiếp.
+Mẫu không deadlock chiếm phần lớn và chỉ được nhớ trong lần chạy, để file
+chỉ lớn theo số mẫu deadlock thật sự.
+"""
+import os
+
+# Bán kính ô quanh thùng vừa đẩy: ô (2 * RADIUS + 1)^2
+RADIUS = 2
+SIZE = 2 * RADIUS + 1
+WINDOW_CELLS = SIZE * SIZE
+# Lưới cục bộ gồm ô và một vành bao quanh
+EXTENT = SIZE + 2
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pattern_dbs",
+                            "deadlock_patterns.txt")
+# Số trạng thái tối đa khi phân tích một mẫu; vượt quá thì coi như không deadlock
+NODE_LIMIT = 5000
+# Ô có nhiều thùng hơn thì không phân tích: tốn kém mà hiếm khi tìm ra deadlock
+MAX_BOXES = 4
+
+def _local(x, y):
+    """Chỉ số trong lưới cục bộ của toạ độ (x, y) tính từ góc ô, vành có toạ độ -1 và SIZE"""
+    return (y + 1) * EXTENT + x + 1
+
+# Bit thứ k của khoá ứng với ô cục bộ WINDOW[k]
+WINDOW = [_local(x, y) for y in range(SIZE) for x in range(SIZE)]
+RING = 0
+for _y in range(-1, SIZE + 1):
+    for _x in range(-1, SIZE + 1):
+        if _x in (-1, SIZE) or _y in (-1, SIZE):
+            RING |= 1 << _local(_x, _y)
+LOCAL_NEIGHBORS = []
+for _i in range(EXTENT * EXTENT):
+    _y, _x = divmod(_i, EXTENT)
+    LOCAL_NEIGHBORS.append([(_y + dy) * EXTENT + _x + dx
+                            if 0 <= _x + dx < EXTENT and 0 <= _y + dy < EXTENT else -1
+                            for dx, dy in ((0, -1), (0, 1), (-1, 0), (1, 0))])
+LOCAL_OPPOSITE = [1, 0, 3, 2]
+
+def _to_local(mask):
+    """Đổi bitmask theo thứ tự khoá sang bitmask của lưới cục bộ"""
+    local = 0
+    k = 0
+    while mask:
+        if mask & 1:
+            local |= 1 << WINDOW[k]
+        mask >>= 1
+        k += 1
+    return local
+
+def _reach(player, blocked):
+    region = 1 << player
+    stack = [player]
+    while stack:
+        cell = stack.pop()
+        for nxt in LOCAL_NEIGHBORS[cell]:
+            if nxt >= 0 and not (region | blocked) >> nxt & 1:
+                region |= 1 << nxt
+                stack.append(nxt)
+    return region
+
+def _solvable(walls, goals, boxes, player):
+    """Tìm kiếm vét cạn trong lưới cục bộ: True/False, None nếu vượt NODE_LIMIT"""
+    start = (boxes, player)
+    seen = {start}
+    stack = [start]
+    while stack:
+        boxes, player = stack.pop()
+        if boxes & ~goals == 0:
+            return True
+        region = _reach(player, walls | boxes)
+        remaining = boxes
+        while remaining:
+            low = remaining & -remaining
+            box = low.bit_length() - 1
+            remaining ^= low
+            for d in range(4):
+                target = LOCAL_NEIGHBORS[box][d]
+                stand = LOCAL_NEIGHBORS[box][LOCAL_OPPOSITE[d]]
+                if target < 0 or stand < 0 or not region >> stand & 1:
+                    continue
+                if (walls | boxes) >> target & 1:
+                    continue
+                # Thùng ra tới vành: coi như đã xong, bỏ khỏi bàn
+                new_boxes = boxes ^ low if RING >> target & 1 else boxes ^ low ^ (1 << target)
+                new_region = _reach(box, walls | new_boxes)
+                state = (new_boxes, (new_region & -new_region).bit_length() - 1)
+                if state not in seen:
+                    if len(seen) >= NODE_LIMIT:
+                        return None
+                    seen.add(state)
+                    stack.append(state)
+    return False
+
+def analyse(key):
+    """True nếu mẫu (khoá) chắc chắn deadlock với mọi vị trí người chơi"""
+    mask = (1 << WINDOW_CELLS) - 1
+    walls = _to_local(key & mask)
+    goals = _to_local(key >> WINDOW_CELLS & mask)
+    boxes = _to_local(key >> 2 * WINDOW_CELLS & mask)
+    # Thử người chơi ở từng vùng sàn rời nhau; chỉ cần một vùng giải được là không deadlock
+    free = ((1 << EXTENT * EXTENT) - 1) & ~(walls | boxes)
+    while free:
+        player = (free & -free).bit_length() - 1
+        free &= ~_reach(player, walls | boxes)
+        if _solvable(walls, goals, boxes, player) is not False:
+            return False
+    return True
+
+class PatternStore:
+    """Các mẫu đã phân tích: mẫu deadlock đọc từ file, cộng các mẫu mới trong lần chạy.
+
+    path=None: chỉ giữ trong bộ nhớ. save() ghi nối các mẫu deadlock mới
+    vào cuối file; mẫu không deadlock không được ghi.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.dead = set()
+        self.alive = set()
+        self.new = []
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    # Dòng cuối có thể bị cắt dở nếu lần chạy trước bị ngắt;
+                    # dòng "0 ..." của file định dạng cũ được bỏ qua
+                    if len(parts) != 2 or parts[0] != "1":
+                        continue
+                    try:
+                        self.dead.add(int(parts[1], 16))
+                    except ValueError:
+                        continue
+
+    def lookup(self, key):
+        """True/False nếu đã biết mẫu, None nếu chưa"""
+        if key in self.dead:
+            return True
+        if key in self.alive:
+            return False
+        return None
+
+    def add(self, key, dead):
+        if dead:
+            self.dead.add(key)
+            self.new.append(key)
+        else:
+            self.alive.add(key)
+
+    def save(self):
+        """Ghi nối các mẫu deadlock mới; trả về số mẫu đã ghi"""
+        if not self.path or not self.new:
+            return 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Một lần write ở chế độ nối thêm để các tiến trình không ghi đè lên nhau
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(f"1 {key:x}\n" for key in self.new))
+        count = len(self.new)
+        self.new = []
+        return count
+
+class PatternDeadlocks:
+    """Tra mẫu deadlock cho các cú đẩy của một level"""
+
+    def __init__(self, level, store):
+        self.store = store
+        # Với mỗi ô: tường, đích (theo thứ tự khoá) và danh sách (bit, ô của level) của ô 5x5 quanh nó
+        self.walls = []
+        self.goals = []
+        self.cells = []
+        for x, y in level.cells:
+            walls = goals = 0
+            cells = []
+            for k in range(WINDOW_CELLS):
+                dy, dx = divmod(k, SIZE)
+                cell = level.index.get((x + dx - RADIUS, y + dy - RADIUS))
+                if cell is None:
+                    walls |= 1 << k
+                    continue
+                if level.goals >> cell & 1:
+                    goals |= 1 << k
+                cells.append((1 << k, cell))
+            self.walls.append(walls)
+            self.goals.append(goals)
+            self.cells.append(cells)
+
+    def is_deadlock(self, boxes, box):
+        """True nếu các thùng quanh ô box khớp một mẫu deadlock"""
+        window = 0
+        for bit, cell in self.cells[box]:
+            if boxes >> cell & 1:
+                window |= bit
+        goals = self.goals[box]
+        # Một thùng hoặc mọi thùng đã trên đích: để DeadlockDetector lo
+        if window & (window - 1) == 0 or window & ~goals == 0:
+            return False
+        if bin(window).count("1") > MAX_BOXES:
+            return False
+        key = self.walls[box] | goals << WINDOW_CELLS | window << 2 * WINDOW_CELLS
+        dead = self.store.lookup(key)
+        if dead is None:
+            dead = analyse(key)
+            self.store.add(key, dead)
+        return dead
@@ -0,0 +1,72 @@
+"""
+Trạng thái ván chơi cập nhật tăng dần, dùng chung cho giao diện và bộ giải
+
+Lưới ký tự vẫn được giữ để vẽ và để truyền cho bộ giải, nhưng vị trí người
+chơi, tập thùng và số thùng chưa vào đích được cập nhật O(1) mỗi bước, nên
+không còn phải quét cả bàn cờ để tìm người chơi hay kiểm tra hoàn thành.
+Bộ giải cũng dùng các chỉ số này: level là phần tĩnh dạng bitboard dựng một
+lần, player_cell và box_mask là trạng thái hiện tại trên đó, và search_level()
+trả về Level bắt đầu từ trạng thái hiện tại mà không quét lại lưới.
+"""
+from board import Level
+
+class GameState:
+    """Một ván chơi: lưới ký tự cùng các chỉ số được cập nhật theo từng bước"""
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.level = Level(grid)
+        self.player = None
+        self.boxes = set()
+        # Số thùng chưa nằm trên đích
+        self.remaining = 0
+        for y, row in enumerate(grid):
+            for x, c in enumerate(row):
+                if c in ("@", "+"):
+                    self.player = (x, y)
+                elif c in ("$", "*"):
+                    self.boxes.add((x, y))
+                    if c == "$":
+                        self.remaining += 1
+        # Chỉ số ô người chơi và bitmask thùng trên self.level
+        self.player_cell = self.level.initial_player
+        self.box_mask = self.level.initial_boxes
+
+    def move(self, dx, dy):
+        """Đi một bước; trả về danh sách ô (x, y) đã thay đổi (rỗng nếu bị chặn)"""
+        grid = self.grid
+        px, py = self.player
+        tx, ty = px + dx, py + dy
+        target = grid[ty][tx]
+        if target == "#":
+            return []
+        changed = [(px, py), (tx, ty)]
+        if target in ("$", "*"):
+            bx, by = tx + dx, ty + dy
+            behind = grid[by][bx]
+            if behind in ("#", "$", "*"):
+                return []  # bị chặn
+            # đẩy hộp
+            grid[by][bx] = "*" if behind == "." else "$"
+            grid[ty][tx] = "@" if target == "$" else "+"
+            self.boxes.remove((tx, ty))
+            self.boxes.add((bx, by))
+            index = self.level.index
+            self.box_mask ^= (1 << index[(tx, ty)]) | (1 << index[(bx, by)])
+            self.remaining += (grid[by][bx] == "$") - (target == "$")
+            changed.append((bx, by))
+        else:
+            grid[ty][tx] = "@" if target == " " else "+"
+        # rời ô cũ
+        grid[py][px] = " " if grid[py][px] == "@" else "."
+        self.player = (tx, ty)
+        self.player_cell = self.level.index[(tx, ty)]
+        return changed
+
+    def search_level(self):
+        """Level của bộ giải bắt đầu từ trạng thái hiện tại (dùng chung phần tĩnh với self.level)"""
+        return self.level.at(self.player_cell, self.box_mask)
+
+    def is_completed(self):
+        """Mọi thùng đã nằm trên đích"""
+        return self.remaining == 0
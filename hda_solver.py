@@ -0,0 +1,320 @@
+"""
+A* song song phân chia theo băm (HDA*) trên nhiều tiến trình
+
+Mỗi trạng thái thuộc về đúng một tiến trình con, chọn theo khoá Zobrist
+(khoá % số tiến trình). Trạng thái con được gom theo tiến trình sở hữu và
+gửi từng lô qua hàng đợi multiprocessing; tiến trình sở hữu lo kiểm tra
+trùng lặp và đưa vào hàng đợi ưu tiên của mình. Lời giải đầu tiên chỉ là
+cận trên: tìm kiếm chỉ dừng khi mọi tiến trình không còn nút có f nhỏ hơn
+cận và không còn lô nào đang trên đường (hai lượt đếm thông điệp liên tiếp
+khớp nhau), nên lời giải vẫn tối ưu.
+
+Độ tăng tốc theo số tiến trình đo bằng benchmark.py --hda-workers.
+
+    python hda_solver.py --level 4 --workers 8
+"""
+import argparse
+import heapq
+import multiprocessing
+import os
+import queue
+import time
+from array import array
+
+from astar_solver import SUCCESSORS, NodeStore, astar_solve, make_estimator, path_to_moves
+from board import as_level, normalize_player
+from deadlock import DeadlockDetector
+from heuristics import INF
+from transposition import TranspositionTable, Zobrist
+
+# Khoảng thời gian tối thiểu giữa hai lượt hỏi trạng thái các tiến trình (giây)
+PROBE_INTERVAL = 0.02
+
+class _HdaWorker:
+    """Một tiến trình con: giữ hàng đợi, bảng chuyển vị và các nút của phần trạng thái mình sở hữu"""
+
+    def __init__(self, wid, count, level, mode, heuristic, inboxes, results, batch_size):
+        self.wid = wid
+        self.count = count
+        self.level = level
+        self.successors = SUCCESSORS[mode]
+        self.detector = DeadlockDetector(self.level)
+        self.estimator = make_estimator(self.level, heuristic)
+        self.zobrist = Zobrist(self.level)
+        self.table = TranspositionTable()
+        self.nodes = NodeStore()
+        # Tiến trình giữ nút cha của từng nút (cha có thể ở tiến trình khác)
+        self.parent_owners = array('i')
+        self.open_set = []
+        self.inboxes = inboxes
+        self.inbox = inboxes[wid]
+        self.results = results
+        self.batch_size = batch_size
+        self.outgoing = [[] for _ in range(count)]
+        self.bound = INF
+        # Số lô đã gửi/nhận, dùng để phát hiện kết thúc
+        self.sent = 0
+        self.received = 0
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates = 0
+
+    def has_work(self):
+        return bool(self.open_set) and self.open_set[0][0] < self.bound
+
+    def run(self):
+        while True:
+            # Xử lý hết thư đang chờ; hết việc thì gửi nốt các lô rồi chờ thư mới
+            while True:
+                if self.has_work():
+                    try:
+                        message = self.inbox.get_nowait()
+                    except queue.Empty:
+                        break
+                else:
+                    self.flush()
+                    message = self.inbox.get()
+                if message[0] == "stop":
+                    return
+                self.handle(message)
+            for _ in range(self.batch_size):
+                if not self.has_work():
+                    break
+                self.expand()
+            self.flush()
+
+    def handle(self, message):
+        kind = message[0]
+        if kind == "nodes":
+            self.received += 1
+            self.receive(message[1])
+        elif kind == "bound":
+            self.bound = min(self.bound, message[1])
+        elif kind == "probe":
+            self.results.put(("probe", message[1], not self.has_work(), self.sent, self.received,
+                              self.expanded, self.generated, self.duplicates))
+        elif kind == "trace":
+            node = message[1]
+            self.results.put(("trace", self.parent_owners[node], self.nodes.parents[node],
+                              self.nodes.moves[node]))
+
+    def receive(self, batch):
+        """Nhận các trạng thái mình sở hữu: bỏ trùng lặp rồi đưa vào hàng đợi"""
+        for player, boxes, key, g, h, parent_owner, parent, move in batch:
+            if g + h >= self.bound:
+                continue
+            if not self.table.offer(key, g):
+                self.duplicates += 1
+                continue
+            node = self.nodes.add(parent, move, player, boxes, key)
+            self.parent_owners.append(parent_owner)
+            heapq.heappush(self.open_set, (g + h, h, g, node))
+
+    def expand(self):
+        f_score, h, g_score, node = heapq.heappop(self.open_set)
+        nodes = self.nodes
+        key = nodes.keys[node]
+        best_g = self.table.get(key)
+        if best_g is not None and best_g < g_score:
+            return
+        self.expanded += 1
+        player = nodes.players[node]
+        boxes = nodes.boxes[node]
+        if self.level.is_solved(boxes):
+            self.bound = g_score
+            self.results.put(("solution", self.wid, node, g_score))
+            return
+        for new_player, new_boxes, push, move_code in self.successors(self.level, player, boxes,
+                                                                       self.detector):
+            new_g = g_score + 1
+            new_h = h
+            if push is not None:
+                new_h = self.estimator.update(boxes, push[0], push[1], new_boxes)
+                if new_h is None:
+                    continue
+            if new_g + new_h >= self.bound:
+                continue
+            new_key = self.zobrist.child(key, player, new_player, push)
+            self.generated += 1
+            child = (new_player, new_boxes, new_key, new_g, new_h, self.wid, node, move_code)
+            owner = new_key % self.count
+            if owner == self.wid:
+                self.receive([child])
+                continue
+            batch = self.outgoing[owner]
+            batch.append(child)
+            if len(batch) >= self.batch_size:
+                self.send(owner)
+
+    def send(self, owner):
+        self.inboxes[owner].put(("nodes", self.outgoing[owner]))
+        self.outgoing[owner] = []
+        self.sent += 1
+
+    def flush(self):
+        for owner, batch in enumerate(self.outgoing):
+            if batch:
+                self.send(owner)
+
+def _run_worker(wid, count, level, mode, heuristic, inboxes, results, batch_size):
+    try:
+        _HdaWorker(wid, count, level, mode, heuristic, inboxes, results, batch_size).run()
+    finally:
+        # Thư còn trong bộ đệm không cần nữa: đừng chờ gửi hết khi thoát
+        for q in inboxes:
+            q.cancel_join_thread()
+        results.cancel_join_thread()
+
+def hda_solve(initial_grid, mode="push", workers=None, stats=None, cancel=None,
+              heuristic="matching", batch_size=16):
+    """A* song song trên workers tiến trình, cùng tham số và kết quả như astar_solve.
+
+    workers: số tiến trình con (mặc định: số lõi CPU). Với một tiến trình,
+    hoặc khi đang chạy trong tiến trình daemon (như Pool của batch_solve,
+    vốn không được tạo tiến trình con), dùng astar_solve.
+    batch_size: số nút mỗi tiến trình mở rộng giữa hai lần gửi lô và đọc thư;
+    nhỏ thì các tiến trình sớm thấy nút f thấp của nhau, ít mở rộng thừa hơn.
+    stats: chỉ nhận các bộ đếm tổng (expanded, generated, duplicates) khi xong.
+    """
+    level = as_level(initial_grid)
+    if level.initial_player < 0:
+        return None
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        return astar_solve(initial_grid, mode, stats=stats, cancel=cancel, heuristic=heuristic)
+
+    # Tính nút gốc ở đây; với "pdb" việc này cũng dựng sẵn file bảng cho các tiến trình con
+    estimator = make_estimator(level, heuristic)
+    initial_player = level.initial_player
+    initial_boxes = level.initial_boxes
+    if mode == "push":
+        initial_player = normalize_player(level.reachable(initial_player, initial_boxes))
+    initial_h = estimator.evaluate(initial_boxes)
+    if initial_h is None:
+        return None
+    initial_key = Zobrist(level).hash(initial_player, initial_boxes)
+
+    inboxes = [multiprocessing.Queue() for _ in range(workers)]
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_run_worker,
+                                         args=(wid, workers, level, mode, heuristic, inboxes,
+                                               results, batch_size),
+                                         daemon=True)
+                 for wid in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        inboxes[initial_key % workers].put(
+            ("nodes", [(initial_player, initial_boxes, initial_key, 0, initial_h, -1, -1, -1)]))
+        best, totals = _coordinate(inboxes, results, processes, cancel)
+        if best is None:
+            return None
+        if stats is not None:
+            stats.expanded, stats.generated, stats.duplicates = totals
+        return path_to_moves(level, mode, _trace(inboxes, results, best[1], best[2]))
+    finally:
+        for inbox in inboxes:
+            inbox.put(("stop",))
+        for process in processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+
+def _coordinate(inboxes, results, processes, cancel):
+    """Theo dõi các tiến trình tới khi kết thúc.
+
+    Trả về (lời giải tốt nhất (g, tiến trình, nút) hoặc None, tổng các bộ
+    đếm); lời giải None cũng khi bị huỷ. Kết thúc khi hai lượt hỏi liên
+    tiếp đều thấy mọi tiến trình rảnh và cùng tổng số lô đã gửi = đã nhận.
+    """
+    workers = len(inboxes)
+    best = None
+    wave = 0
+    replies = None
+    previous = None
+    last_probe = 0.0
+    while True:
+        if cancel is not None and cancel.is_set():
+            return None, None
+        if replies is None and time.monotonic() - last_probe >= PROBE_INTERVAL:
+            wave += 1
+            replies = []
+            last_probe = time.monotonic()
+            for inbox in inboxes:
+                inbox.put(("probe", wave))
+        try:
+            message = results.get(timeout=PROBE_INTERVAL)
+        except queue.Empty:
+            if any(process.exitcode not in (None, 0) for process in processes):
+                raise RuntimeError("Một tiến trình HDA* bị dừng bất thường")
+            continue
+        if message[0] == "solution":
+            _, wid, node, g = message
+            if best is None or g < best[0]:
+                best = (g, wid, node)
+                for inbox in inboxes:
+                    inbox.put(("bound", g))
+        elif message[0] == "probe" and message[1] == wave:
+            replies.append(message[2:])
+            if len(replies) < workers:
+                continue
+            idle = all(reply[0] for reply in replies)
+            # Lô chứa nút gốc do tiến trình chính gửi
+            sent = 1 + sum(reply[1] for reply in replies)
+            received = sum(reply[2] for reply in replies)
+            totals = tuple(sum(reply[i] for reply in replies) for i in (3, 4, 5))
+            replies = None
+            current = (sent, received) if idle and sent == received else None
+            if current is not None and current == previous:
+                return best, totals
+            previous = current
+
+def _trace(inboxes, results, owner, node):
+    """Dựng lại danh sách mã nước đi bằng cách hỏi lần lượt tiến trình giữ từng nút cha"""
+    path = []
+    while True:
+        inboxes[owner].put(("trace", node))
+        message = results.get()
+        while message[0] != "trace":
+            message = results.get()  # bỏ các trả lời cũ còn sót
+        _, parent_owner, parent, move = message
+        if parent < 0:
+            break
+        path.append(move)
+        owner, node = parent_owner, parent
+    path.reverse()
+    return path
+
+def main():
+    from level_reader import iter_levels
+    from levels import LEVELS
+
+    parser = argparse.ArgumentParser(description="Giải một level bằng HDA* và so sánh với A*")
+    parser.add_argument("--level", type=int, default=1, help="Số thứ tự level (từ 1)")
+    parser.add_argument("--collection", metavar="FILE",
+                        help="File bộ level XSB/SOK (mặc định: các level của game)")
+    parser.add_argument("--mode", choices=("move", "push"), default="push")
+    parser.add_argument("--heuristic", choices=("matching", "pdb"), default="matching")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Số tiến trình (mặc định: số lõi CPU)")
+    parser.add_argument("--no-astar", action="store_true", help="Không chạy A* để so sánh")
+    args = parser.parse_args()
+
+    if args.collection:
+        levels = [rows for _, rows in iter_levels(args.collection)]
+    else:
+        levels = LEVELS
+    grid = [list(row) for row in levels[args.level - 1]]
+    runs = [("hda", lambda: hda_solve(grid, args.mode, args.workers, heuristic=args.heuristic))]
+    if not args.no_astar:
+        runs.append(("astar", lambda: astar_solve(grid, args.mode, heuristic=args.heuristic)))
+    for name, run in runs:
+        start = time.perf_counter()
+        solution = run()
+        elapsed = time.perf_counter() - start
+        length = len(solution) if solution else None
+        print(f"{name:6} {elapsed:8.3f}s  lời giải {length} bước")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Heuristic cho A*: bảng khoảng cách đẩy thật và ghép cặp thùng-đích tối ưu
+"""
+from collections import deque
+
+from board import OPPOSITE, iter_cells
+
+# Chi phí thay cho "không thể tới" trong bài toán ghép cặp
+INF = 10 ** 6
+
+def push_distances(level):
+    """Bảng distances[ô][i] = số cú đẩy tối thiểu đưa thùng từ ô tới đích thứ i.
+
+    Tính một lần cho mỗi level bằng BFS kéo ngược thùng từ từng đích
+    (chỉ xét tường, bỏ qua các thùng khác), nên luôn là cận dưới.
+    """
+    distances = [[INF] * len(level.goal_cells) for _ in level.cells]
+    for i, goal in enumerate(level.goal_cells):
+        distances[goal][i] = 0
+        queue = deque([goal])
+        while queue:
+            cell = queue.popleft()
+            for d in range(4):
+                nxt = level.neighbors[cell][d]
+                if nxt < 0 or distances[nxt][i] != INF:
+                    continue
+                if level.neighbors[nxt][d] < 0:
+                    continue
+                distances[nxt][i] = distances[cell][i] + 1
+                queue.append(nxt)
+    return distances
+
+def pull_distances(level):
+    """Bảng distances[ô][i] = số cú kéo tối thiểu đưa thùng từ ô về vị trí ban đầu thứ i.
+
+    Dùng cho chiều ngược của tìm kiếm hai chiều: BFS đẩy xuôi thùng từ
+    từng vị trí ban đầu (chỉ xét tường), nên cũng luôn là cận dưới.
+    """
+    starts = list(iter_cells(level.initial_boxes))
+    distances = [[INF] * len(starts) for _ in level.cells]
+    for i, start in enumerate(starts):
+        distances[start][i] = 0
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            for d in range(4):
+                nxt = level.neighbors[cell][d]
+                if nxt < 0 or distances[nxt][i] != INF:
+                    continue
+                if level.neighbors[cell][OPPOSITE[d]] < 0:
+                    continue
+                distances[nxt][i] = distances[cell][i] + 1
+                queue.append(nxt)
+    return distances
+
+def _augment(costs, row, u, v, p):
+    """Thêm hàng row vào cặp ghép hiện tại (một bước của thuật toán Hungarian).
+
+    Chỉ số bắt đầu từ 1; cột 0 là cột giả. p[j] là hàng ghép với cột j.
+    """
+    m = len(v) - 1
+    minv = [INF * INF] * (m + 1)
+    used = [False] * (m + 1)
+    way = [0] * (m + 1)
+    p[0] = row
+    j0 = 0
+    while True:
+        used[j0] = True
+        i0 = p[j0]
+        row_costs = costs[i0 - 1]
+        delta = INF * INF
+        j1 = 0
+        for j in range(1, m + 1):
+            if not used[j]:
+                cur = row_costs[j - 1] - u[i0] - v[j]
+                if cur < minv[j]:
+                    minv[j] = cur
+                    way[j] = j0
+                if minv[j] < delta:
+                    delta = minv[j]
+                    j1 = j
+        for j in range(m + 1):
+            if used[j]:
+                u[p[j]] += delta
+                v[j] -= delta
+            else:
+                minv[j] -= delta
+        j0 = j1
+        if p[j0] == 0:
+            break
+    while j0:
+        j1 = way[j0]
+        p[j0] = p[j1]
+        j0 = j1
+
+class MatchingHeuristic:
+    """Cận dưới = tổng chi phí ghép cặp thùng-đích tối ưu theo bảng khoảng cách đẩy.
+
+    Kết quả ghép của mỗi cấu hình thùng được giữ lại; khi chỉ một thùng
+    di chuyển, cặp ghép được sửa bằng một lần tăng luồng thay vì giải lại.
+    distances: bảng khoảng cách thay cho push_distances (ví dụ pull_distances
+    khi ghép thùng với vị trí ban đầu); số cột phải bằng số đích.
+    """
+
+    def __init__(self, level, max_entries=200000, distances=None):
+        self.level = level
+        self.distances = push_distances(level) if distances is None else distances
+        self.max_entries = max_entries
+        # boxes -> (h, các ô thùng theo thứ tự hàng, u, v, p)
+        self.cache = {}
+
+    def evaluate(self, boxes):
+        """Giá trị heuristic của cấu hình boxes, None nếu không thể ghép hết"""
+        entry = self.cache.get(boxes)
+        if entry is None:
+            rows = list(iter_cells(boxes))
+            if len(rows) > len(self.level.goal_cells):
+                return None
+            costs = [self.distances[cell] for cell in rows]
+            u = [0] * (len(rows) + 1)
+            v = [0] * (len(self.level.goal_cells) + 1)
+            p = [0] * len(v)
+            for row in range(1, len(rows) + 1):
+                _augment(costs, row, u, v, p)
+            entry = self._store(boxes, rows, u, v, p)
+        return entry[0]
+
+    def update(self, boxes, old_cell, new_cell, new_boxes):
+        """Heuristic của new_boxes, khi chỉ có thùng ở old_cell chuyển sang new_cell"""
+        entry = self.cache.get(new_boxes)
+        if entry is not None:
+            return entry[0]
+        parent = self.cache.get(boxes)
+        # Ghép cặp tăng dần chỉ đúng khi số thùng bằng số đích
+        if parent is None or len(parent[1]) != len(self.level.goal_cells):
+            return self.evaluate(new_boxes)
+        _, rows, u, v, p = parent
+        row = rows.index(old_cell) + 1
+        rows = list(rows)
+        rows[row - 1] = new_cell
+        u, v, p = list(u), list(v), list(p)
+        costs = [self.distances[cell] for cell in rows]
+        # Bỏ cặp ghép cũ của thùng và hạ thế vị hàng để vẫn khả thi
+        p[p.index(row, 1)] = 0
+        new_costs = costs[row - 1]
+        u[row] = min(new_costs[j - 1] - v[j] for j in range(1, len(v)))
+        _augment(costs, row, u, v, p)
+        return self._store(new_boxes, rows, u, v, p)[0]
+
+    def _store(self, boxes, rows, u, v, p):
+        """Lưu kết quả ghép cặp vào cache"""
+        costs = [self.distances[cell] for cell in rows]
+        total = sum(costs[p[j] - 1][j - 1] for j in range(1, len(p)) if p[j])
+        h = None if total >= INF else total
+        if len(self.cache) >= self.max_entries:
+            self.cache.clear()
+        entry = (h, tuple(rows), u, v, p)
+        self.cache[boxes] = entry
+        return entry
@@ -0,0 +1,93 @@
+"""
+Thuật toán IDA* để giải Sokoban với bộ nhớ giới hạn
+
+Tìm kiếm theo chiều sâu có cận f = g + h, nới cận sau mỗi vòng. Bộ nhớ chỉ
+tỉ lệ với độ sâu lời giải cộng một bảng chuyển vị nhỏ có sức chứa cố định,
+nên dùng được cho các level mà hàng đợi của A* làm tràn bộ nhớ.
+"""
+from astar_solver import SUCCESSORS, make_estimator, path_to_moves
+from board import as_level, normalize_player
+from deadlock import DeadlockDetector
+from heuristics import INF
+from transposition import TranspositionTable, Zobrist
+
+def ida_solve(initial_grid, mode="push", table=None, stats=None, cancel=None,
+              heuristic="matching", patterns=None):
+    """Thuật toán IDA* để giải Sokoban, cùng tham số và kết quả như astar_solve.
+
+    table: bảng chuyển vị dùng để cắt các trạng thái đã gặp trong vòng hiện
+    tại với g không lớn hơn; mặc định 100000 mục để bộ nhớ luôn bị chặn.
+    Bảng được xoá khi bắt đầu mỗi vòng.
+    patterns: PatternStore các mẫu deadlock, như astar_solve.
+    """
+    level = as_level(initial_grid)
+    if level.initial_player < 0:
+        return None
+    successors = SUCCESSORS[mode]
+    detector = DeadlockDetector(level, patterns)
+    estimator = make_estimator(level, heuristic)
+    zobrist = Zobrist(level)
+    if table is None:
+        table = TranspositionTable(capacity=100000)
+    if stats is not None:
+        successors = stats.timed_successors(successors)
+        estimator = stats.timed_heuristic(estimator)
+        stats.track_table(table)
+
+    initial_player = level.initial_player
+    initial_boxes = level.initial_boxes
+    if mode == "push":
+        initial_player = normalize_player(level.reachable(initial_player, initial_boxes))
+    initial_h = estimator.evaluate(initial_boxes)
+    if initial_h is None:
+        return None
+    initial_key = zobrist.hash(initial_player, initial_boxes)
+
+    bound = initial_h
+    while True:
+        table.clear()
+        table.offer(initial_key, 0)
+        next_bound = INF
+        # Mỗi khung: [người chơi, thùng, khoá, g, h, các con chưa thử, mã nước đi tới khung này]
+        stack = [[initial_player, initial_boxes, initial_key, 0, initial_h, None, -1]]
+        while stack:
+            frame = stack[-1]
+            player, boxes, key, g, h, children, _ = frame
+            if children is None:
+                if cancel is not None and cancel.is_set():
+                    return None
+                if stats is not None:
+                    stats.expand(g + h, len(stack))
+                if level.is_solved(boxes):
+                    return path_to_moves(level, mode, [f[6] for f in stack[1:]])
+                # Sinh các con trong cận, thử con có h nhỏ nhất trước
+                children = []
+                for new_player, new_boxes, push, move_code in successors(level, player, boxes, detector):
+                    new_h = h
+                    if push is not None:
+                        new_h = estimator.update(boxes, push[0], push[1], new_boxes)
+                        if new_h is None:
+                            continue
+                    new_f = g + 1 + new_h
+                    if new_f > bound:
+                        next_bound = min(next_bound, new_f)
+                        continue
+                    new_key = zobrist.child(key, player, new_player, push)
+                    if not table.offer(new_key, g + 1):
+                        if stats is not None:
+                            stats.duplicates += 1
+                        continue
+                    children.append((new_h, new_player, new_boxes, new_key, move_code))
+                    if stats is not None:
+                        stats.generated += 1
+                # Đảo ngược để pop() lấy con tốt nhất
+                children.sort(key=lambda child: child[0], reverse=True)
+                frame[5] = children
+            if not children:
+                stack.pop()
+                continue
+            new_h, new_player, new_boxes, new_key, move_code = children.pop()
+            stack.append([new_player, new_boxes, new_key, g + 1, new_h, None, move_code])
+        if next_bound >= INF:
+            return None  # Không tìm thấy giải pháp
+        bound = next_bound
@@ -0,0 +1,155 @@
+"""
+Đọc bộ level chuẩn dạng XSB/SOK (có hỗ trợ nén run-length)
+
+Hai cách dùng:
+    for title, rows in iter_levels("collection.xsb"):   # đọc dần từng level
+        ...
+    levels = LevelCollection("collection.xsb")           # truy cập ngẫu nhiên
+    rows = levels[1234]                                 # chỉ đọc đúng level đó
+
+LevelCollection dựng chỉ mục vị trí byte của từng level một lần và lưu
+cạnh file (đuôi .idx), nên mở level thứ N không phải phân tích cả file.
+"""
+import json
+import os
+
+# Ký tự hợp lệ trong một dòng level; '-' và '_' là sàn trống
+LEVEL_CHARS = set("#@+$*. -_")
+RLE_CHARS = LEVEL_CHARS | set("0123456789|")
+
+def expand_rle(line):
+    """Giải nén run-length: "3#2 $" -> "###  $"; '|' là dấu xuống dòng"""
+    out = []
+    count = ""
+    for ch in line:
+        if ch.isdigit():
+            count += ch
+        else:
+            out.append(ch * int(count or 1))
+            count = ""
+    return "".join(out)
+
+def is_level_line(line):
+    """Dòng có phải là một hàng của level không (sau khi bỏ ký tự xuống dòng)"""
+    return bool(line.strip()) and "#" in line and all(ch in RLE_CHARS for ch in line)
+
+def parse_rows(lines):
+    """Đổi các dòng level thô thành danh sách hàng (giải nén, chuẩn hoá sàn trống)"""
+    rows = []
+    for line in lines:
+        for row in expand_rle(line).split("|"):
+            rows.append(row.replace("-", " ").replace("_", " ").rstrip())
+    return rows
+
+def _title(line):
+    """Giá trị của dòng "Title: ..." hoặc None"""
+    if line.lower().startswith("title:"):
+        return line.split(":", 1)[1].strip() or None
+    return None
+
+def _levels_from_lines(lines):
+    """Duyệt (title, rows) từ một dãy dòng bất kỳ (file đang mở hoặc một đoạn của file)"""
+    block = []      # các dòng của level đang đọc
+    current = None  # level đã đọc xong phần hàng, đang chờ metadata
+    title = None
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        if is_level_line(line):
+            if not block and current is not None:
+                yield title, current
+                current, title = None, None
+            block.append(line)
+            continue
+        if block:
+            current = parse_rows(block)
+            block = []
+        if current is not None and title is None:
+            title = _title(line)
+    if block:
+        current = parse_rows(block)
+    if current is not None:
+        yield title, current
+
+def iter_levels(path):
+    """Duyệt (title, rows) của từng level trong file, đọc dần không nạp cả file.
+
+    title lấy từ dòng "Title:" sau level, None nếu không có.
+    """
+    with open(path, encoding="utf-8", errors="replace") as f:
+        yield from _levels_from_lines(f)
+
+def build_index(path):
+    """Danh sách vị trí byte bắt đầu của từng level (chỉ nhận diện dòng, không phân tích)"""
+    offsets = []
+    in_level = False
+    position = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            if is_level_line(line):
+                if not in_level:
+                    offsets.append(position)
+                in_level = True
+            else:
+                in_level = False
+            position += len(raw)
+    return offsets
+
+class LevelCollection:
+    """Bộ level trong một file XSB/SOK, truy cập ngẫu nhiên qua chỉ mục vị trí byte.
+
+    Dùng được như danh sách LEVELS: len(collection) và collection[i] -> rows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = self._load_index()
+
+    def _load_index(self):
+        """Đọc chỉ mục .idx nếu còn khớp với file, ngược lại dựng lại và lưu"""
+        index_path = self.path + ".idx"
+        stat = os.stat(self.path)
+        signature = {"size": stat.st_size, "mtime": stat.st_mtime}
+        try:
+            with open(index_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("size") == signature["size"] and data.get("mtime") == signature["mtime"]:
+                return data["offsets"]
+        except (OSError, ValueError, KeyError):
+            pass
+        offsets = build_index(self.path)
+        try:
+            with open(index_path, "w", encoding="utf-8") as f:
+                json.dump(dict(signature, offsets=offsets), f)
+        except OSError:
+            # Thư mục chỉ đọc: dùng chỉ mục trong bộ nhớ
+            pass
+        return offsets
+
+    def entry(self, index):
+        """(title, rows) của level thứ index, chỉ đọc đoạn file chứa level đó"""
+        if index < 0:
+            index += len(self.offsets)
+        if not 0 <= index < len(self.offsets):
+            raise IndexError(index)
+        start = self.offsets[index]
+        end = self.offsets[index + 1] if index + 1 < len(self.offsets) else None
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            data = f.read() if end is None else f.read(end - start)
+        lines = data.decode("utf-8", errors="replace").splitlines()
+        return next(_levels_from_lines(lines))
+
+    def title(self, index):
+        """Tên level (dòng Title:) hoặc None"""
+        return self.entry(index)[0]
+
+    def __getitem__(self, index):
+        return self.entry(index)[1]
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        for _, rows in iter_levels(self.path):
+            yield rows
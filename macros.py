@@ -0,0 +1,246 @@
+"""
+Macro đẩy thùng: đường hầm và phòng đích, phân tích một lần cho mỗi level
+
+Đường hầm: ô rộng một ô có tường ở hai bên vuông góc với hướng đẩy. Thùng
+bị đẩy vào đường hầm được đẩy thẳng tới khi ra khỏi hầm (hoặc bị chặn),
+thay vì mỗi cú đẩy là một nút.
+
+Phòng đích: vùng chứa đích chỉ nối với phần còn lại qua một ô cửa. Thứ tự
+lấp đích được tính trước sao cho đích đã lấp không chặn đích sau; thùng
+vào tới cửa được đưa thẳng tới đích kế tiếp theo đường đẩy dựng sẵn.
+
+Mỗi macro là một nút với chi phí bằng số cú đẩy thật, nên A* tìm lời giải
+ít cú đẩy nhất trên đồ thị macro. Đồ thị này bỏ đi một số nước đi (để thùng
+lại giữa hầm, lấp đích theo thứ tự khác) nên lời giải có thể dài hơn tối ưu.
+"""
+from collections import deque
+
+from board import OPPOSITE, iter_cells, normalize_player
+
+# Bỏ qua các vùng lớn hơn: khi đó không còn là "phòng" và dựng đường đẩy tốn kém
+MAX_ROOM_CELLS = 48
+
+def _flood(level, start, blocked):
+    """Bitmask các ô nối với start mà không đi qua blocked"""
+    region = 1 << start
+    stack = [start]
+    while stack:
+        cell = stack.pop()
+        for nxt in level.neighbors[cell]:
+            if nxt >= 0 and not (region | blocked) >> nxt & 1:
+                region |= 1 << nxt
+                stack.append(nxt)
+    return region
+
+def _route(level, allowed, fixed, box, player, goal):
+    """Chuỗi cú đẩy (ô thùng, hướng) ngắn nhất đưa thùng từ box tới goal.
+
+    Thùng và người chơi chỉ ở trong allowed, các thùng fixed đứng yên.
+    None nếu không đưa tới được.
+    """
+    everywhere = (1 << len(level.cells)) - 1
+    blocked = fixed | (everywhere & ~allowed)
+    start = (box, normalize_player(level.reachable(player, blocked | (1 << box))))
+    came_from = {start: None}
+    queue = deque([start])
+    while queue:
+        state = queue.popleft()
+        box, player = state
+        if box == goal:
+            pushes = []
+            while came_from[state] is not None:
+                state, push = came_from[state]
+                pushes.append(push)
+            pushes.reverse()
+            return pushes
+        region = level.reachable(player, blocked | (1 << box))
+        for d in range(4):
+            target = level.neighbors[box][d]
+            stand = level.neighbors[box][OPPOSITE[d]]
+            if target < 0 or blocked >> target & 1 or stand < 0 or not region >> stand & 1:
+                continue
+            new_player = normalize_player(level.reachable(box, blocked | (1 << target)))
+            new_state = (target, new_player)
+            if new_state not in came_from:
+                came_from[new_state] = (state, (box, d))
+                queue.append(new_state)
+    return None
+
+class GoalRoom:
+    """Một phòng đích: ô cửa, hướng vào, thứ tự lấp đích và đường đẩy cho từng bước"""
+
+    def __init__(self, entrance, direction, cells, order, routes):
+        self.entrance = entrance
+        self.direction = direction
+        self.cells = cells
+        self.order = order
+        self.routes = routes
+        # Các thùng trong phòng ứng với k đích đầu tiên đã lấp -> k
+        self.prefixes = {}
+        mask = 0
+        for k, goal in enumerate(order):
+            self.prefixes[mask] = k
+            mask |= 1 << goal
+
+def _find_rooms(level):
+    """Các phòng đích rời nhau của level (rỗng nếu số thùng khác số đích)"""
+    if bin(level.initial_boxes).count("1") != len(level.goal_cells):
+        return []
+    candidates = []
+    for entrance in range(len(level.cells)):
+        if (level.goals | level.initial_boxes) >> entrance & 1 or entrance == level.initial_player:
+            continue
+        for d in range(4):
+            inside = level.neighbors[entrance][d]
+            outside = level.neighbors[entrance][OPPOSITE[d]]
+            if inside < 0 or outside < 0:
+                continue
+            cells = _flood(level, inside, 1 << entrance)
+            if (cells >> outside & 1 or cells >> level.initial_player & 1
+                    or cells & level.initial_boxes or not cells & level.goals):
+                continue
+            size = bin(cells).count("1")
+            if size > MAX_ROOM_CELLS:
+                continue
+            # Chỉ một ô kề của cửa nằm trong phòng
+            if sum(1 for nxt in level.neighbors[entrance] if nxt >= 0 and cells >> nxt & 1) != 1:
+                continue
+            candidates.append((size, entrance, d, cells))
+    # Ưu tiên phòng nhỏ nhất quanh các đích, bỏ các vùng chồng lên nhau
+    candidates.sort()
+    rooms = []
+    used = 0
+    for _, entrance, d, cells in candidates:
+        area = cells | (1 << entrance)
+        if area & used:
+            continue
+        room = _pack_room(level, entrance, d, cells)
+        if room is not None:
+            rooms.append(room)
+            used |= area
+    return rooms
+
+def _pack_room(level, entrance, direction, cells):
+    """Tính thứ tự lấp đích và đường đẩy từng bước, None nếu không lấp kín được.
+
+    Lần ngược từ phòng đã đầy: đích lấp cuối cùng là đích mà thùng từ cửa
+    đẩy tới được khi mọi đích khác đã có thùng (chọn đường ngắn nhất).
+    """
+    outside = level.neighbors[entrance][OPPOSITE[direction]]
+    allowed = cells | (1 << entrance)
+    filled = cells & level.goals
+    order = []
+    routes = []
+    while filled:
+        best = None
+        for goal in iter_cells(filled):
+            route = _route(level, allowed, filled & ~(1 << goal), entrance, outside, goal)
+            if route is not None and (best is None or len(route) < len(best[1])):
+                best = (goal, route)
+        if best is None:
+            return None
+        goal, route = best
+        order.append(goal)
+        routes.append(route)
+        filled &= ~(1 << goal)
+    order.reverse()
+    routes.reverse()
+    return GoalRoom(entrance, direction, cells, order, routes)
+
+def _tunnels(level):
+    """tunnels[d]: bitmask các ô không phải đích có tường ở hai bên vuông góc với hướng d"""
+    tunnels = [0, 0, 0, 0]
+    for cell, neighbors in enumerate(level.neighbors):
+        if level.goals >> cell & 1:
+            continue
+        vertical = neighbors[2] < 0 and neighbors[3] < 0
+        horizontal = neighbors[0] < 0 and neighbors[1] < 0
+        for d, inside in ((0, vertical), (1, vertical), (2, horizontal), (3, horizontal)):
+            if inside:
+                tunnels[d] |= 1 << cell
+    return tunnels
+
+class MacroAnalysis:
+    """Đường hầm và phòng đích của một level, cùng bảng mã các macro đã dùng.
+
+    Mã nước đi nhỏ hơn 4 * số ô là một cú đẩy thường (ô * 4 + hướng);
+    mã lớn hơn trỏ tới một chuỗi cú đẩy trong bảng macro.
+    """
+
+    def __init__(self, level):
+        self.level = level
+        self.base = 4 * len(level.cells)
+        self.tunnels = _tunnels(level)
+        self.rooms = {room.entrance: room for room in _find_rooms(level)}
+        self.sequences = []
+        self.codes = {}
+
+    def code(self, pushes):
+        """Mã nước đi của chuỗi cú đẩy"""
+        if len(pushes) == 1:
+            box, d = pushes[0]
+            return box * 4 + d
+        key = tuple(pushes)
+        code = self.codes.get(key)
+        if code is None:
+            code = self.base + len(self.sequences)
+            self.sequences.append(key)
+            self.codes[key] = code
+        return code
+
+    def cost(self, code):
+        """Số cú đẩy thật của một mã nước đi"""
+        return 1 if code < self.base else len(self.sequences[code - self.base])
+
+    def expand(self, path):
+        """Đổi danh sách mã nước đi thành chuỗi cú đẩy (ô thùng, hướng)"""
+        pushes = []
+        for code in path:
+            if code < self.base:
+                pushes.append(divmod(code, 4))
+            else:
+                pushes.extend(self.sequences[code - self.base])
+        return pushes
+
+    def _room_route(self, entrance, direction, boxes):
+        """Đường đẩy từ cửa tới đích kế tiếp của phòng, None nếu không dùng macro được.
+
+        boxes không gồm thùng đang được đưa vào.
+        """
+        room = self.rooms.get(entrance)
+        if room is None or room.direction != direction:
+            return None
+        k = room.prefixes.get(boxes & room.cells)
+        if k is None:
+            return None
+        return room.routes[k]
+
+    def successors(self, level, player, boxes, detector):
+        """Như push_successors nhưng gộp các đoạn đẩy trong đường hầm và vào phòng đích"""
+        region = level.reachable(player, boxes)
+        neighbors = level.neighbors
+        for box, d, new_boxes in level.pushes(region, boxes):
+            others = boxes & ~(1 << box)
+            # Thùng đang ở cửa phòng và được đẩy vào trong
+            pushes = self._room_route(box, d, others)
+            if pushes is None:
+                pushes = [(box, d)]
+                cell = neighbors[box][d]
+                # Đẩy thẳng qua đường hầm
+                while self.tunnels[d] >> cell & 1:
+                    nxt = neighbors[cell][d]
+                    if nxt < 0 or others >> nxt & 1 or cell in self.rooms:
+                        break
+                    pushes.append((cell, d))
+                    cell = nxt
+                # Thùng vừa tới cửa phòng, người chơi đứng ngay sau
+                route = self._room_route(cell, d, others)
+                if route is not None:
+                    pushes = pushes + route
+            last_box, last_d = pushes[-1]
+            final = neighbors[last_box][last_d]
+            new_boxes = others | (1 << final)
+            if detector.is_deadlock(new_boxes, final):
+                continue
+            new_player = normalize_player(level.reachable(last_box, new_boxes))
+            yield new_player, new_boxes, (box, final), self.code(pushes)
@@ -1,12 +1,20 @@
+import sys
+
 import pygame
+from game_state import GameState
+from level_reader import LevelCollection
 from levels import LEVELS
-from astar_solver import astar_solve
+from replanner import FRAME_BUDGET, Replanner
+from solution_cache import SolutionCache
+from solver_worker import SolverWorker
 
 # Trạng thái game
 MENU = 0
 PLAYING = 1
 
 TILE = 48
+# Số nút level trên một trang menu
+LEVELS_PER_PAGE = 6
 COLORS = {
     "background": (210, 180, 140),  # Nền gỗ nâu nhạt (light brown wood)
     "wall": (180, 150, 110),  # Tường gỗ nâu nhạt với hiệu ứng 3D (light brown embossed)
@@ -22,42 +30,18 @@ COLORS = {
     "box_on_goal": (50, 205, 50),  # Thùng xanh lá khi đặt đúng (green crate)
 }
 
-def load_level(index):
-    grid = [list(row) for row in LEVELS[index]]
-    h, w = len(grid), len(grid[0])
-    return grid, w, h
-
-def find_player(grid):
-    for y, row in enumerate(grid):
-        for x, c in enumerate(row):
-            if c in ("@", "+"):  # Tìm cả @ và + (nhân vật trên vị trí đích)
-                return x, y
-    return None
-
-def is_completed(grid):
-    return all(c != "$" for row in grid for c in row)
+def load_level(index, levels=LEVELS):
+    rows = levels[index]
+    # Level trong file chuẩn có thể có các hàng dài ngắn khác nhau
+    w = max(len(row) for row in rows)
+    grid = [list(row.ljust(w)) for row in rows]
+    h = len(grid)
+    return GameState(grid), w, h
 
-def move(grid, dx, dy):
-    px, py = find_player(grid)
-    tx, ty = px + dx, py + dy
-    # Ô kế
-    target = grid[ty][tx]
-    if target == "#":
-        return
-    # Nếu là hộp/ hộp trên đích, cần xem ô sau nữa
-    if target in ("$", "*"):
-        bx, by = tx + dx, ty + dy
-        behind = grid[by][bx]
-        if behind in ("#", "$", "*"):
-            return  # bị chặn
-        # đẩy hộp
-        grid[by][bx] = "*" if behind == "." else "$"
-        grid[ty][tx] = "@" if target == "$" else "+"  # @ đứng trên floor hoặc goal
-    else:
-        # ô trống hoặc goal
-        grid[ty][tx] = "@" if target == " " else "+"
-    # rời ô cũ
-    grid[py][px] = " " if grid[py][px] == "@" else "."
+def level_name(levels, index):
+    """Tên hiển thị của level: Title trong file bộ level, nếu không có thì "Level N" """
+    title = levels.title(index) if isinstance(levels, LevelCollection) else None
+    return title or f"Level {index + 1}"
 
 def draw_wood_texture(screen, rect, base_color, light_color):
     """Vẽ ô có viền đen đậm"""
@@ -75,104 +59,144 @@ def draw_embossed_block(screen, rect, base_color, light_color, dark_color):
     pygame.draw.line(screen, dark_color, rect.bottomleft, rect.bottomright, 2)
     pygame.draw.line(screen, dark_color, rect.topright, rect.bottomright, 2)
 
-def draw_grid(screen, grid, offset_y=0, offset_x=0):
-    # Vẽ theo từng lớp để tránh chồng chất
-    # offset_y: offset để tránh các nút ở trên
-    # offset_x: offset để căn giữa map theo chiều ngang
+def render_static_layer(grid, tile=TILE):
+    """Vẽ một lần phần không đổi của level (sàn, tường, dấu X đích) lên một Surface"""
+    width = max(len(row) for row in grid)
+    # Chừa 2 pixel: viền tối của tường ở mép dưới/phải vẽ lấn ra ngoài ô
+    layer = pygame.Surface((width * tile + 2, len(grid) * tile + 2))
+    layer.fill(COLORS["background"])
     # Lớp 1: Vẽ sàn và tường
     for y, row in enumerate(grid):
         for x, c in enumerate(row):
-            rect = pygame.Rect(x * TILE + offset_x, y * TILE + offset_y, TILE, TILE)
+            rect = pygame.Rect(x * tile, y * tile, tile, tile)
             if c == "#":
                 # Vẽ tường gỗ với hiệu ứng 3D embossed
-                draw_embossed_block(screen, rect, COLORS["wall"], 
+                draw_embossed_block(layer, rect, COLORS["wall"],
                                    COLORS["wall_light"], COLORS["wall_dark"])
             else:
                 # Vẽ sàn gỗ với texture
-                draw_wood_texture(screen, rect, COLORS["floor"], COLORS["floor_light"])
-    
-    # Lớp 2: Vẽ dấu X đích (luôn ở dưới các phần tử khác)
-    for y, row in enumerate(grid):
-        for x, c in enumerate(row):
-            rect = pygame.Rect(x * TILE, y * TILE, TILE, TILE)
-            # Chỉ vẽ dấu X nếu là vị trí đích trống hoặc có nhân vật/thùng trên đó
+                draw_wood_texture(layer, rect, COLORS["floor"], COLORS["floor_light"])
+            # Lớp 2: Vẽ dấu X đích (nằm dưới thùng và nhân vật)
             if c in (".", "+", "*"):
-                rect = pygame.Rect(x * TILE + offset_x, y * TILE + offset_y, TILE, TILE)
                 center_x, center_y = rect.center
-                size = TILE // 3
-                # Vẽ dấu X màu xanh lá
-                pygame.draw.line(screen, COLORS["goal"], 
+                size = tile // 3
+                pygame.draw.line(layer, COLORS["goal"],
                                (center_x - size, center_y - size),
                                (center_x + size, center_y + size), 5)
-                pygame.draw.line(screen, COLORS["goal"], 
+                pygame.draw.line(layer, COLORS["goal"],
                                (center_x - size, center_y + size),
                                (center_x + size, center_y - size), 5)
-    
-    # Lớp 3: Vẽ thùng (sau dấu X đích)
-    for y, row in enumerate(grid):
-        for x, c in enumerate(row):
-            rect = pygame.Rect(x * TILE + offset_x, y * TILE + offset_y, TILE, TILE)
-            if c in ("$", "*"):
-                box_rect = rect.inflate(-8, -8)
-                if c == "*":
-                    # Thùng đã đặt đúng - màu xanh lá
-                    pygame.draw.rect(screen, COLORS["box_on_goal"], box_rect)
-                    pygame.draw.rect(screen, (30, 150, 30), box_rect, 2)
-                    # Vẽ dấu X trên thùng
-                    center_x, center_y = box_rect.center
-                    size_x = box_rect.width // 4
-                    pygame.draw.line(screen, (255, 255, 255), 
-                                   (center_x - size_x, center_y - size_x),
-                                   (center_x + size_x, center_y + size_x), 3)
-                    pygame.draw.line(screen, (255, 255, 255), 
-                                   (center_x - size_x, center_y + size_x),
-                                   (center_x + size_x, center_y - size_x), 3)
-                else:
-                    # Thùng gỗ nâu với hiệu ứng 3D
-                    pygame.draw.rect(screen, COLORS["box"], box_rect)
-                    # Viền sáng
-                    pygame.draw.line(screen, COLORS["box_light"], 
-                                   box_rect.topleft, box_rect.topright, 2)
-                    pygame.draw.line(screen, COLORS["box_light"], 
-                                   box_rect.topleft, box_rect.bottomleft, 2)
-                    # Viền tối
-                    pygame.draw.line(screen, (100, 50, 0), 
-                                   box_rect.bottomleft, box_rect.bottomright, 2)
-                    pygame.draw.line(screen, (100, 50, 0), 
-                                   box_rect.topright, box_rect.bottomright, 2)
-                    # Vẽ pattern X trên mặt thùng (màu sáng hơn)
-                    center_x, center_y = box_rect.center
-                    size_x = box_rect.width // 3
-                    pygame.draw.line(screen, COLORS["box_light"], 
-                                   (center_x - size_x, center_y - size_x),
-                                   (center_x + size_x, center_y + size_x), 3)
-                    pygame.draw.line(screen, COLORS["box_light"], 
-                                   (center_x - size_x, center_y + size_x),
-                                   (center_x + size_x, center_y - size_x), 3)
-    
-    # Lớp 4: Vẽ nhân vật (luôn ở trên cùng)
-    for y, row in enumerate(grid):
-        for x, c in enumerate(row):
-            rect = pygame.Rect(x * TILE + offset_x, y * TILE + offset_y, TILE, TILE)
-            if c in ("@", "+"):
-                center_x, center_y = rect.center
-                # Vẽ thân người (quần áo xanh dương)
-                body_radius = TILE // 3
-                pygame.draw.circle(screen, COLORS["player_body"], 
-                                 (center_x, center_y + 4), body_radius)
-                # Vẽ mũ bảo hiểm vàng
-                hat_rect = pygame.Rect(center_x - TILE // 4, center_y - TILE // 3,
-                                     TILE // 2, TILE // 4)
-                pygame.draw.rect(screen, COLORS["player_hat"], hat_rect)
-                pygame.draw.rect(screen, (200, 150, 0), hat_rect, 2)
-                # Vẽ mặt
-                pygame.draw.circle(screen, (255, 220, 177), 
-                                 (center_x, center_y), body_radius - 4)
-                # Vẽ mắt
-                pygame.draw.circle(screen, (0, 0, 0), 
-                                 (center_x - 4, center_y - 2), 2)
-                pygame.draw.circle(screen, (0, 0, 0), 
-                                 (center_x + 4, center_y - 2), 2)
+    return layer
+
+def _render_box(tile, on_goal):
+    """Sprite thùng (nền trong suốt)"""
+    sprite = pygame.Surface((tile, tile), pygame.SRCALPHA)
+    box_rect = pygame.Rect(0, 0, tile, tile).inflate(-8, -8)
+    center_x, center_y = box_rect.center
+    if on_goal:
+        # Thùng đã đặt đúng - màu xanh lá
+        pygame.draw.rect(sprite, COLORS["box_on_goal"], box_rect)
+        pygame.draw.rect(sprite, (30, 150, 30), box_rect, 2)
+        # Vẽ dấu X trên thùng
+        size_x = box_rect.width // 4
+        pygame.draw.line(sprite, (255, 255, 255),
+                       (center_x - size_x, center_y - size_x),
+                       (center_x + size_x, center_y + size_x), 3)
+        pygame.draw.line(sprite, (255, 255, 255),
+                       (center_x - size_x, center_y + size_x),
+                       (center_x + size_x, center_y - size_x), 3)
+    else:
+        # Thùng gỗ nâu với hiệu ứng 3D
+        pygame.draw.rect(sprite, COLORS["box"], box_rect)
+        # Viền sáng
+        pygame.draw.line(sprite, COLORS["box_light"],
+                       box_rect.topleft, box_rect.topright, 2)
+        pygame.draw.line(sprite, COLORS["box_light"],
+                       box_rect.topleft, box_rect.bottomleft, 2)
+        # Viền tối
+        pygame.draw.line(sprite, (100, 50, 0),
+                       box_rect.bottomleft, box_rect.bottomright, 2)
+        pygame.draw.line(sprite, (100, 50, 0),
+                       box_rect.topright, box_rect.bottomright, 2)
+        # Vẽ pattern X trên mặt thùng (màu sáng hơn)
+        size_x = box_rect.width // 3
+        pygame.draw.line(sprite, COLORS["box_light"],
+                       (center_x - size_x, center_y - size_x),
+                       (center_x + size_x, center_y + size_x), 3)
+        pygame.draw.line(sprite, COLORS["box_light"],
+                       (center_x - size_x, center_y + size_x),
+                       (center_x + size_x, center_y - size_x), 3)
+    return sprite
+
+def _render_player(tile):
+    """Sprite nhân vật (nền trong suốt)"""
+    sprite = pygame.Surface((tile, tile), pygame.SRCALPHA)
+    center_x, center_y = tile // 2, tile // 2
+    # Vẽ thân người (quần áo xanh dương)
+    body_radius = tile // 3
+    pygame.draw.circle(sprite, COLORS["player_body"],
+                     (center_x, center_y + 4), body_radius)
+    # Vẽ mũ bảo hiểm vàng
+    hat_rect = pygame.Rect(center_x - tile // 4, center_y - tile // 3,
+                         tile // 2, tile // 4)
+    pygame.draw.rect(sprite, COLORS["player_hat"], hat_rect)
+    pygame.draw.rect(sprite, (200, 150, 0), hat_rect, 2)
+    # Vẽ mặt
+    pygame.draw.circle(sprite, (255, 220, 177),
+                     (center_x, center_y), body_radius - 4)
+    # Vẽ mắt
+    pygame.draw.circle(sprite, (0, 0, 0),
+                     (center_x - 4, center_y - 2), 2)
+    pygame.draw.circle(sprite, (0, 0, 0),
+                     (center_x + 4, center_y - 2), 2)
+    return sprite
+
+# Sprite đã vẽ sẵn theo kích thước ô: tile -> {ký tự: Surface}
+_SPRITES = {}
+
+def get_sprites(tile=TILE):
+    """Sprite của các ô động (thùng, thùng trên đích, nhân vật), vẽ một lần mỗi kích thước ô"""
+    sprites = _SPRITES.get(tile)
+    if sprites is None:
+        player = _render_player(tile)
+        sprites = {
+            "$": _render_box(tile, on_goal=False),
+            "*": _render_box(tile, on_goal=True),
+            "@": player,
+            "+": player,
+        }
+        _SPRITES[tile] = sprites
+    return sprites
+
+def draw_grid(screen, state, offset_y=0, offset_x=0, static_layer=None):
+    # state: GameState của ván đang chơi
+    # offset_y: offset để tránh các nút ở trên
+    # offset_x: offset để căn giữa map theo chiều ngang
+    # static_layer: Surface của render_static_layer(state.grid); None thì vẽ lại (chậm)
+    if static_layer is None:
+        static_layer = render_static_layer(state.grid)
+    # Phần tĩnh: một lần blit
+    screen.blit(static_layer, (offset_x, offset_y))
+    # Phần động: thùng rồi nhân vật (luôn ở trên cùng), không cần quét cả lưới
+    sprites = get_sprites(TILE)
+    for x, y in state.boxes:
+        screen.blit(sprites[state.grid[y][x]], (x * TILE + offset_x, y * TILE + offset_y))
+    if state.player is not None:
+        x, y = state.player
+        screen.blit(sprites["@"], (x * TILE + offset_x, y * TILE + offset_y))
+
+def draw_tiles(screen, grid, cells, static_layer, offset_y=0, offset_x=0):
+    """Vẽ lại riêng các ô trong cells (danh sách (x, y)); trả về các Rect đã vẽ"""
+    sprites = get_sprites(TILE)
+    rects = []
+    for x, y in cells:
+        rect = pygame.Rect(x * TILE + offset_x, y * TILE + offset_y, TILE, TILE)
+        screen.blit(static_layer, rect, area=pygame.Rect(x * TILE, y * TILE, TILE, TILE))
+        c = grid[y][x]
+        if c in sprites:
+            screen.blit(sprites[c], rect)
+        rects.append(rect)
+    return rects
 
 class Button:
     """Lớp nút bấm với styling đẹp"""
@@ -236,7 +260,24 @@ class Button:
         """Kiểm tra nút có được click không"""
         return self.rect.collidepoint(pos)
 
-def draw_menu(screen, font, level_buttons):
+def make_level_buttons(levels, page, screen_width):
+    """Các nút level của một trang menu"""
+    buttons = []
+    button_width = 300
+    button_height = 70
+    button_spacing = 80
+    start_x = screen_width // 2 - button_width // 2
+    start_y = 250
+    first = page * LEVELS_PER_PAGE
+    for i in range(first, min(first + LEVELS_PER_PAGE, len(levels))):
+        y = start_y + (i - first) * button_spacing
+        buttons.append(Button(start_x, y, button_width, button_height,
+                              level_name(levels, i)[:20],
+                              color=(100, 150, 200),
+                              hover_color=(120, 170, 220)))
+    return buttons
+
+def draw_menu(screen, font, level_buttons, page=0, pages=1):
     """Vẽ màn hình menu chọn level"""
     screen.fill(COLORS["background"])
     
@@ -253,8 +294,14 @@ def draw_menu(screen, font, level_buttons):
     
     for button in level_buttons:
         button.draw(screen, font)
+    
+    # Chỉ báo trang khi bộ level có nhiều hơn một trang
+    if pages > 1:
+        page_text = font.render(f"< Page {page + 1}/{pages} >", True, (0, 0, 0))
+        page_rect = page_text.get_rect(center=(screen.get_width() // 2, screen.get_height() - 40))
+        screen.blit(page_text, page_rect)
 
-def draw_game_ui(screen, font, reset_button, menu_button, solve_button, level_idx):
+def draw_game_ui(screen, font, reset_button, menu_button, solve_button, level_idx, status_text=None):
     """Vẽ UI khi đang chơi với panel đẹp"""
     UI_HEIGHT = 80
     screen_width = screen.get_width()
@@ -280,6 +327,12 @@ def draw_game_ui(screen, font, reset_button, menu_button, solve_button, level_id
     level_text = font.render(f"Level {level_idx + 1}", True, (255, 255, 255))
     screen.blit(level_text, (20, UI_HEIGHT // 2 - level_text.get_height() // 2))
     
+    # Vẽ tiến độ của bộ giải ở dải dưới cùng của panel
+    if status_text:
+        status_font = pygame.font.SysFont(None, 20)
+        status = status_font.render(status_text, True, (220, 220, 120))
+        screen.blit(status, (20, UI_HEIGHT - status.get_height() - 2))
+    
     # Vẽ các nút
     reset_button.draw(screen, font)
     menu_button.draw(screen, font)
@@ -288,6 +341,9 @@ def draw_game_ui(screen, font, reset_button, menu_button, solve_button, level_id
 def main():
     pygame.init()
     
+    # Có thể mở một file bộ level chuẩn: python main.py collection.xsb
+    level_set = LevelCollection(sys.argv[1]) if len(sys.argv) > 1 else LEVELS
+    
     # Tạo màn hình menu với kích thước cố định
     MENU_WIDTH = 1000
     MENU_HEIGHT = 800
@@ -300,24 +356,13 @@ def main():
     # Trạng thái game
     game_state = MENU
     level_idx = 0
-    grid = None
+    state = None
     w, h = 0, 0
     
-    # Tạo các nút level cho menu
-    level_buttons = []
-    button_width = 300
-    button_height = 70
-    button_spacing = 80
-    start_x = MENU_WIDTH // 2 - button_width // 2
-    start_y = 250
-    
-    for i in range(len(LEVELS)):
-        y = start_y + i * button_spacing
-        button = Button(start_x, y, button_width, button_height, 
-                       f"Level {i + 1}", 
-                       color=(100, 150, 200), 
-                       hover_color=(120, 170, 220))
-        level_buttons.append(button)
+    # Tạo các nút level cho menu (chia trang)
+    menu_page = 0
+    menu_pages = max(1, -(-len(level_set) // LEVELS_PER_PAGE))
+    level_buttons = make_level_buttons(level_set, menu_page, MENU_WIDTH)
     
     # Nút chơi lại và thoát (khi đang chơi) - sẽ được căn giữa khi load level
     reset_button = Button(0, 15, 130, 50, "Replay", 
@@ -330,17 +375,40 @@ def main():
                          color=(100, 200, 100), 
                          hover_color=(130, 230, 130))
     
+    # Lớp tĩnh đã vẽ sẵn của level đang chơi
+    static_layer = None
+    static_level = None
+    
     # Biến cho solver
     solution = None
     solution_step = 0
     auto_play = False
     last_move_time = 0
+    # Kế hoạch của level đang chơi, dùng cho gợi ý (phím H) và giải lại khi đã đi lệch
+    replanner = None
+    replan_goal = None  # "hint" / "play" khi đang tìm từng khung hình, ngược lại None
+    hint_text = None
+    # Bộ giải chạy nền để cửa sổ không bị treo
+    solver = SolverWorker()
+    # Lời giải đã tìm được lưu trên đĩa, mở lại level là có ngay
+    cache = SolutionCache()
+
+    # Những gì đã có trên màn hình: chỉ vẽ lại phần thay đổi
+    drawn = None        # trạng thái của lần vẽ toàn màn hình gần nhất
+    drawn_ui = None     # trạng thái panel trên cùng lần vẽ gần nhất
+    dirty_cells = []    # ô (x, y) của bàn cờ đã thay đổi từ lần vẽ trước
 
     running = True
     while running:
+        events = pygame.event.get()
+        # Không có gì chuyển động: ngủ chờ sự kiện thay vì quay vòng 60 lần/giây
+        idle = (drawn is not None and not auto_play and not solver.pending and not dirty_cells
+                and replan_goal is None)
+        if idle and not events:
+            events = [pygame.event.wait()]
         mouse_pos = pygame.mouse.get_pos()
         
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
             
@@ -349,8 +417,10 @@ def main():
                     # Kiểm tra click vào nút level
                     for i, button in enumerate(level_buttons):
                         if button.is_clicked(mouse_pos):
-                            level_idx = i
-                            grid, w, h = load_level(level_idx)
+                            solver.cancel()
+                            level_idx = menu_page * LEVELS_PER_PAGE + i
+                            state, w, h = load_level(level_idx, level_set)
+                            replanner = Replanner(state.level)
                             # Tăng chiều cao màn hình để có không gian cho các nút
                             UI_HEIGHT = 80
                             screen_width = max(w * TILE + 40, 400)  # Đảm bảo màn hình đủ rộng
@@ -371,50 +441,91 @@ def main():
                             solution = None
                             solution_step = 0
                             auto_play = False
+                            replan_goal = None
+                            hint_text = None
                             game_state = PLAYING
                             break
                 
                 elif game_state == PLAYING:
                     # Kiểm tra click vào nút chơi lại
                     if reset_button.is_clicked(mouse_pos):
-                        grid, w, h = load_level(level_idx)
+                        solver.cancel()
+                        state, w, h = load_level(level_idx, level_set)
                         solution = None
                         solution_step = 0
                         auto_play = False
+                        replan_goal = None
+                        hint_text = None
                     # Kiểm tra click vào nút thoát
                     elif menu_button.is_clicked(mouse_pos):
+                        solver.cancel()
                         game_state = MENU
                         screen = pygame.display.set_mode((MENU_WIDTH, MENU_HEIGHT))
                         solution = None
                         solution_step = 0
                         auto_play = False
+                        replan_goal = None
+                        hint_text = None
                     # Kiểm tra click vào nút Solve (tất cả các level)
                     elif solve_button.is_clicked(mouse_pos):
-                        if solution is None:
-                            # Chạy solver
-                            print(f"Đang giải level {level_idx + 1} bằng A*...")
-                            grid_copy = [list(row) for row in grid]
-                            solution = astar_solve(grid_copy)
-                            if solution:
-                                print(f"Tìm thấy giải pháp: {len(solution)} bước")
+                        if solver.running or replan_goal == "play":
+                            # Bấm lần nữa khi đang giải thì huỷ
+                            solver.cancel()
+                            replan_goal = None
+                            print("Đã huỷ giải")
+                        elif solution is None:
+                            cached = cache.get(state.search_level(), solver.mode)
+                            if cached is not None:
+                                solution = cached
+                                replanner.learn(state.search_level(), solution)
+                                print(f"Lấy lời giải từ cache: {len(solution)} bước")
                                 solution_step = 0
                                 auto_play = True
+                            elif replanner.plan:
+                                # Đã có kế hoạch của level (người chơi đi lệch): giải lại từ
+                                # trạng thái hiện tại, dùng lại các lần tìm trước
+                                replan_goal = "play"
                             else:
-                                print("Không tìm thấy giải pháp!")
+                                # Chạy solver trong luồng nền
+                                print(f"Đang giải level {level_idx + 1} bằng A*...")
+                                solver.start(state)
                         else:
                             # Bật/tắt auto play
                             auto_play = not auto_play
             
             if event.type == pygame.KEYDOWN:
-                if game_state == PLAYING:
+                if game_state == MENU:
+                    # Chuyển trang menu
+                    page = menu_page
+                    if event.key in (pygame.K_RIGHT, pygame.K_PAGEDOWN):
+                        page = min(menu_page + 1, menu_pages - 1)
+                    if event.key in (pygame.K_LEFT, pygame.K_PAGEUP):
+                        page = max(menu_page - 1, 0)
+                    if page != menu_page:
+                        menu_page = page
+                        level_buttons = make_level_buttons(level_set, menu_page, MENU_WIDTH)
+                elif game_state == PLAYING:
                     if event.key == pygame.K_ESCAPE:
+                        solver.cancel()
+                        replan_goal = None
                         game_state = MENU
                         screen = pygame.display.set_mode((MENU_WIDTH, MENU_HEIGHT))
                     if event.key in (pygame.K_r, pygame.K_BACKSPACE):
-                        grid, w, h = load_level(level_idx)  # reset level
+                        solver.cancel()
+                        state, w, h = load_level(level_idx, level_set)  # reset level
+                        solution = None
+                        solution_step = 0
+                        auto_play = False
+                        replan_goal = None
+                        hint_text = None
+                    if event.key == pygame.K_h and not solver.running and replan_goal is None:
+                        # Gợi ý bước tiếp theo từ trạng thái hiện tại
+                        replan_goal = "hint"
                     if event.key == pygame.K_n:
-                        level_idx = (level_idx + 1) % len(LEVELS)
-                        grid, w, h = load_level(level_idx)
+                        solver.cancel()
+                        level_idx = (level_idx + 1) % len(level_set)
+                        state, w, h = load_level(level_idx, level_set)
+                        replanner = Replanner(state.level)
                         UI_HEIGHT = 80
                         screen_width = max(w * TILE + 40, 400)
                         screen = pygame.display.set_mode((screen_width, h * TILE + UI_HEIGHT + 60))
@@ -432,9 +543,13 @@ def main():
                         solution = None
                         solution_step = 0
                         auto_play = False
+                        replan_goal = None
+                        hint_text = None
                     if event.key == pygame.K_p:
-                        level_idx = (level_idx - 1) % len(LEVELS)
-                        grid, w, h = load_level(level_idx)
+                        solver.cancel()
+                        level_idx = (level_idx - 1) % len(level_set)
+                        state, w, h = load_level(level_idx, level_set)
+                        replanner = Replanner(state.level)
                         UI_HEIGHT = 80
                         screen_width = max(w * TILE + 40, 400)
                         screen = pygame.display.set_mode((screen_width, h * TILE + UI_HEIGHT + 60))
@@ -452,21 +567,39 @@ def main():
                         solution = None
                         solution_step = 0
                         auto_play = False
+                        replan_goal = None
+                        hint_text = None
+                    step = None
                     if event.key in (pygame.K_UP, pygame.K_w):
-                        move(grid, 0, -1)
+                        step, changed = "U", state.move(0, -1)
                     if event.key in (pygame.K_DOWN, pygame.K_s):
-                        move(grid, 0, 1)
+                        step, changed = "D", state.move(0, 1)
                     if event.key in (pygame.K_LEFT, pygame.K_a):
-                        move(grid, -1, 0)
+                        step, changed = "L", state.move(-1, 0)
                     if event.key in (pygame.K_RIGHT, pygame.K_d):
-                        move(grid, 1, 0)
+                        step, changed = "R", state.move(1, 0)
+                    if step is not None and changed:
+                        dirty_cells += changed
+                        hint_text = None
+                        # Đi đúng bước kế tiếp của lời giải thì vẫn chạy tiếp được; đi lệch thì bỏ
+                        if solution and solution_step < len(solution) and solution[solution_step] == step:
+                            solution_step += 1
+                        else:
+                            solution = None
+                            auto_play = False
         
         # Vẽ màn hình
         if game_state == MENU:
             # Cập nhật hover cho các nút
             for button in level_buttons:
                 button.check_hover(mouse_pos)
-            draw_menu(screen, font, level_buttons)
+            # Menu chỉ vẽ lại khi đổi trang hoặc đổi nút đang hover
+            view = (MENU, menu_page, screen.get_size(),
+                    tuple(button.is_hovered for button in level_buttons))
+            if view != drawn:
+                draw_menu(screen, font, level_buttons, menu_page, menu_pages)
+                pygame.display.flip()
+                drawn = view
         
         elif game_state == PLAYING:
             # Cập nhật hover cho các nút
@@ -474,6 +607,51 @@ def main():
             menu_button.check_hover(mouse_pos)
             solve_button.check_hover(mouse_pos)
             
+            # Nhận kết quả từ bộ giải nền (chỉ của lần giải hiện tại)
+            job = solver.poll()
+            if job is not None:
+                if job.error is not None:
+                    print(f"Bộ giải bị lỗi: {job.error!r}")
+                    hint_text = f"Loi bo giai: {type(job.error).__name__}"
+                elif not job.matches(state):
+                    # Bàn cờ đã đổi trong lúc giải: kết quả không còn đúng
+                    print("Bỏ qua lời giải cũ vì bàn cờ đã thay đổi")
+                elif job.solution:
+                    solution = job.solution
+                    cache.put(job.level, solver.mode, solution)
+                    replanner.learn(job.level, solution)
+                    if job.report is not None:
+                        print(f"Rút gọn lời giải: {job.report['moves_before']} -> "
+                              f"{job.report['moves_after']} bước")
+                    print(f"Tìm thấy giải pháp: {len(solution)} bước")
+                    solution_step = 0
+                    auto_play = True
+                else:
+                    print("Không tìm thấy giải pháp!")
+
+            # Gợi ý / giải lại: mỗi khung hình chỉ tìm trong FRAME_BUDGET giây rồi vẽ tiếp
+            if replan_goal is not None:
+                if replan_goal == "hint":
+                    done, step, remaining = replanner.hint(state.player_cell, state.box_mask, FRAME_BUDGET)
+                    if done:
+                        if step is not None:
+                            hint_text = f"Goi y: {step}  (con {remaining} lan day thung)"
+                        elif not state.is_completed():
+                            hint_text = "Khong con loi giai - hay choi lai (R)"
+                        replan_goal = None
+                else:
+                    done, moves = replanner.replan(state.player_cell, state.box_mask, FRAME_BUDGET)
+                    if done:
+                        replan_goal = None
+                        if moves:
+                            print(f"Giải lại từ trạng thái hiện tại: {len(moves)} bước")
+                            solution = moves
+                            solution_step = 0
+                            auto_play = True
+                        elif moves is None:
+                            print("Không tìm thấy giải pháp!")
+            solve_button.text = "Stop" if solver.running or replan_goal == "play" else "Solve"
+            
             # Tự động chạy giải pháp
             if auto_play and solution and solution_step < len(solution):
                 # Chờ một chút trước khi thực hiện bước tiếp theo
@@ -485,44 +663,80 @@ def main():
                     direction_map = {'U': (0, -1), 'D': (0, 1), 'L': (-1, 0), 'R': (1, 0)}
                     if direction in direction_map:
                         dx, dy = direction_map[direction]
-                        move(grid, dx, dy)
+                        dirty_cells += state.move(dx, dy)
                     solution_step += 1
                     last_move_time = current_time
                     
                     # Dừng nếu hoàn thành
-                    if solution_step >= len(solution) or is_completed(grid):
+                    if solution_step >= len(solution) or state.is_completed():
                         auto_play = False
             
             # Vẽ game với offset để tránh các nút và căn giữa
-            screen.fill(COLORS["background"])
             UI_HEIGHT = 80
             # Tính toán offset_x để căn giữa map
             screen_width = screen.get_width()
-            map_width = len(grid[0]) * TILE if grid else 0
+            map_width = len(state.grid[0]) * TILE
             offset_x = (screen_width - map_width) // 2
-            draw_grid(screen, grid, offset_y=UI_HEIGHT, offset_x=offset_x)
+            # Phần tĩnh của level chỉ vẽ lại khi đổi level
+            if static_level != level_idx:
+                static_layer = render_static_layer(state.grid)
+                static_level = level_idx
             
-            # Vẽ UI panel đẹp với tất cả nút
-            draw_game_ui(screen, font, reset_button, menu_button, solve_button, level_idx)
+            status_text = hint_text
+            if replan_goal is not None and replanner.stats is not None:
+                stats = replanner.stats
+                status_text = f"Dang tim tu trang thai hien tai... nodes {stats.expanded}"
+            if solver.running:
+                stats = solver.stats
+                status_text = (f"Dang giai... nodes {stats.expanded}  "
+                               f"frontier {stats.frontier} (peak {stats.heap_peak})  "
+                               f"dup {stats.duplicates}  {stats.elapsed():.1f}s")
+            completed = state.is_completed()
+            # Ván mới (chọn level, chơi lại) hoặc đổi cửa sổ thì vẽ lại toàn bộ
+            view = (PLAYING, level_idx, id(state), screen.get_size(), completed)
+            ui = (reset_button.is_hovered, menu_button.is_hovered, solve_button.is_hovered,
+                  solve_button.text, status_text)
             
-            # Thông báo hoàn thành với style đẹp
-            if is_completed(grid):
-                # Vẽ panel thông báo
-                msg_y = h * TILE + UI_HEIGHT + 10
-                msg_rect = pygame.Rect(10, msg_y, screen_width - 20, 40)
-                pygame.draw.rect(screen, (50, 200, 50), msg_rect)
-                pygame.draw.rect(screen, (30, 150, 30), msg_rect, 2)
+            if view != drawn:
+                screen.fill(COLORS["background"])
+                draw_grid(screen, state, offset_y=UI_HEIGHT, offset_x=offset_x, static_layer=static_layer)
+                # Vẽ UI panel đẹp với tất cả nút
+                draw_game_ui(screen, font, reset_button, menu_button, solve_button, level_idx, status_text)
                 
-                # Text với shadow
-                text = font.render("Hoan thanh! Nhan N de choi level tiep theo", True, (255, 255, 255))
-                text_rect = text.get_rect(center=msg_rect.center)
-                shadow_text = font.render("Hoan thanh! Nhan N de choi level tiep theo", True, (0, 0, 0))
-                screen.blit(shadow_text, text_rect.move(2, 2))
-                screen.blit(text, text_rect)
-
-        pygame.display.flip()
+                # Thông báo hoàn thành với style đẹp
+                if completed:
+                    # Vẽ panel thông báo
+                    msg_y = h * TILE + UI_HEIGHT + 10
+                    msg_rect = pygame.Rect(10, msg_y, screen_width - 20, 40)
+                    pygame.draw.rect(screen, (50, 200, 50), msg_rect)
+                    pygame.draw.rect(screen, (30, 150, 30), msg_rect, 2)
+                    
+                    # Text với shadow
+                    text = font.render("Hoan thanh! Nhan N de choi level tiep theo", True, (255, 255, 255))
+                    text_rect = text.get_rect(center=msg_rect.center)
+                    shadow_text = font.render("Hoan thanh! Nhan N de choi level tiep theo", True, (0, 0, 0))
+                    screen.blit(shadow_text, text_rect.move(2, 2))
+                    screen.blit(text, text_rect)
+                pygame.display.flip()
+                drawn, drawn_ui = view, ui
+            else:
+                # Chỉ vẽ lại các ô vừa đổi (tối đa 3 ô mỗi bước) và panel nếu cần
+                rects = draw_tiles(screen, state.grid, dirty_cells, static_layer, UI_HEIGHT, offset_x)
+                # Hàng trên cùng của bàn cờ nằm dưới bóng của panel
+                if ui != drawn_ui or any(y == 0 for _, y in dirty_cells):
+                    panel_rect = pygame.Rect(0, 0, screen_width, UI_HEIGHT + 5)
+                    screen.fill(COLORS["background"], panel_rect)
+                    top_row = [(x, 0) for x in range(len(state.grid[0]))]
+                    rects += draw_tiles(screen, state.grid, top_row, static_layer, UI_HEIGHT, offset_x)
+                    draw_game_ui(screen, font, reset_button, menu_button, solve_button, level_idx, status_text)
+                    rects.append(panel_rect)
+                    drawn_ui = ui
+                if rects:
+                    pygame.display.update(rects)
+        dirty_cells = []
         clock.tick(60)
 
+    cache.close()
     pygame.quit()
 
 if __name__ == "__main__":
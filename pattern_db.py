@@ -0,0 +1,177 @@
+"""
+Cơ sở dữ liệu mẫu (pattern database) cho heuristic: chi phí chính xác của từng cặp thùng
+
+Với mỗi level, bảng lưu số cú đẩy tối thiểu để đưa hai thùng (bỏ qua các
+thùng khác) vào hai đích bất kỳ, tính một lần bằng BFS kéo ngược từ mọi cặp
+đích. Bảng được ghi ra file nhị phân (mỗi mục một byte) và mở bằng mmap,
+nên nhiều tiến trình giải cùng level dùng chung một bản trong bộ nhớ. Chi
+phí lớn hơn MAX_COST được lưu là MAX_COST (vẫn là cận dưới).
+
+Dựng trước cho mọi level của game hoặc một file bộ level:
+    python pattern_db.py
+    python pattern_db.py --collection microban.xsb
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+from collections import deque
+from itertools import combinations
+
+from bidirectional_solver import free_regions, pull_successors
+from board import Level, iter_cells
+from heuristics import MatchingHeuristic
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pattern_dbs")
+MAGIC = b"SKPD"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<4sHH")
+# Giá trị cho cặp vị trí không thể đưa vào đích
+UNREACHABLE = 255
+# Chi phí lớn nhất lưu được trong một byte
+MAX_COST = UNREACHABLE - 1
+
+def level_signature(level):
+    """Băm của tường và đích: hai level giống nhau ở hai phần này dùng chung bảng"""
+    text = repr((level.cells, sorted(level.goal_cells)))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+def build_pair_table(level):
+    """Bảng n*n byte: mục [a*n + b] là số cú đẩy tối thiểu đưa thùng ở a và b vào đích.
+
+    BFS chạy hết không gian trạng thái, nên UNREACHABLE chỉ còn ở các cặp
+    thật sự không thể đưa vào đích.
+    """
+    n = len(level.cells)
+    table = bytearray([UNREACHABLE]) * (n * n)
+    everywhere = (1 << n) - 1
+    seen = set()
+    queue = deque()
+    for a, b in combinations(level.goal_cells, 2):
+        boxes = (1 << a) | (1 << b)
+        table[a * n + b] = table[b * n + a] = 0
+        for player in free_regions(level, boxes):
+            seen.add((player, boxes))
+            queue.append((player, boxes, 0))
+    while queue:
+        player, boxes, cost = queue.popleft()
+        for new_player, new_boxes, _, _ in pull_successors(level, player, boxes, everywhere):
+            state = (new_player, new_boxes)
+            if state in seen:
+                continue
+            seen.add(state)
+            a, b = iter_cells(new_boxes)
+            # BFS: lần đầu gặp cặp ô là chi phí nhỏ nhất trên mọi vùng người chơi
+            if table[a * n + b] == UNREACHABLE:
+                table[a * n + b] = table[b * n + a] = min(cost + 1, MAX_COST)
+            queue.append((new_player, new_boxes, cost + 1))
+    return table
+
+def pdb_path(level, directory=DEFAULT_DIR):
+    """Đường dẫn file bảng của level"""
+    # Phiên bản nằm trong tên file: bảng dựng theo định dạng cũ được dựng lại
+    return os.path.join(directory, f"pairs_v{FORMAT_VERSION}_{level_signature(level)}.pdb")
+
+def build(level, directory=DEFAULT_DIR):
+    """Dựng và ghi bảng của level nếu chưa có, trả về đường dẫn file"""
+    path = pdb_path(level, directory)
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    table = build_pair_table(level)
+    # Ghi ra file tạm rồi đổi tên để tiến trình khác không đọc phải file dở
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(level.cells)))
+        f.write(table)
+    os.replace(tmp_path, path)
+    return path
+
+class PatternDatabase:
+    """Bảng cặp thùng của một level, đọc qua mmap (chỉ đọc, dùng chung giữa các tiến trình)"""
+
+    def __init__(self, level, directory=DEFAULT_DIR):
+        path = build(level, directory)
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != FORMAT_VERSION or n != len(level.cells):
+            raise ValueError(f"File pattern database không hợp lệ: {path}")
+        self.n = n
+
+    def pair(self, a, b):
+        """Chi phí của cặp thùng ở ô a và b, None nếu không thể đưa vào đích"""
+        cost = self.data[HEADER.size + a * self.n + b]
+        return None if cost == UNREACHABLE else cost
+
+class PatternDatabaseHeuristic:
+    """max(ghép cặp thùng-đích, tổng các cặp thùng rời nhau trong pattern database).
+
+    Mỗi cú đẩy chỉ di chuyển một thùng nên chi phí của các cặp rời nhau cộng
+    được với nhau. Các thùng được ghép cặp tham lam theo mức tăng so với
+    khoảng cách đơn lẻ; thùng lẻ dùng khoảng cách đơn.
+    """
+
+    def __init__(self, level, directory=DEFAULT_DIR):
+        self.matching = MatchingHeuristic(level)
+        self.pdb = PatternDatabase(level, directory)
+        self.single = [min(row) for row in self.matching.distances]
+
+    def _additive(self, boxes):
+        """Tổng chi phí các cặp rời nhau, None nếu có cặp không thể giải"""
+        cells = list(iter_cells(boxes))
+        single = self.single
+        gains = []
+        for a, b in combinations(cells, 2):
+            cost = self.pdb.pair(a, b)
+            if cost is None:
+                return None
+            gain = cost - single[a] - single[b]
+            if gain > 0:
+                gains.append((gain, a, b))
+        gains.sort(reverse=True)
+        total = sum(single[cell] for cell in cells)
+        used = set()
+        for gain, a, b in gains:
+            if a not in used and b not in used:
+                used.add(a)
+                used.add(b)
+                total += gain
+        return total
+
+    def _combine(self, h, boxes):
+        if h is None:
+            return None
+        additive = self._additive(boxes)
+        if additive is None:
+            return None
+        return max(h, additive)
+
+    def evaluate(self, boxes):
+        return self._combine(self.matching.evaluate(boxes), boxes)
+
+    def update(self, boxes, old_cell, new_cell, new_boxes):
+        return self._combine(self.matching.update(boxes, old_cell, new_cell, new_boxes), new_boxes)
+
+def main():
+    from level_reader import iter_levels
+    from levels import LEVELS
+
+    parser = argparse.ArgumentParser(description="Dựng pattern database cho các level")
+    parser.add_argument("--collection", metavar="FILE",
+                        help="File bộ level XSB/SOK (mặc định: các level của game)")
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="Thư mục chứa các file bảng")
+    args = parser.parse_args()
+
+    if args.collection:
+        levels = (rows for _, rows in iter_levels(args.collection))
+    else:
+        levels = iter(LEVELS)
+    for i, rows in enumerate(levels):
+        level = Level([list(row) for row in rows])
+        path = build(level, args.dir)
+        print(f"Level {i + 1}: {path} ({os.path.getsize(path)} byte)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Gợi ý nước đi và giải lại từ trạng thái hiện tại, dùng lại các lần tìm trước
+
+Mỗi level giữ một Replanner suốt ván chơi, với:
+  - kế hoạch: mọi trạng thái (thùng, vùng người chơi) nằm trên một lời giải
+    đã biết, kèm cú đẩy kế tiếp, số cú đẩy còn lại và cờ "chính xác". Người
+    chơi còn ở trên kế hoạch thì gợi ý chỉ là một lần tra bảng;
+  - h đã học (Adaptive A*): lần tìm ra lời giải tối ưu dài C thì mọi trạng
+    thái s đã mở rộng nhận h(s) = C - g(s). Đích không đổi nên giá trị này
+    vẫn là cận dưới dù lần sau bắt đầu từ trạng thái khác, và lần tìm sau
+    mở rộng ít nút hơn;
+  - bảng ô chết và bộ nhớ đệm của heuristic, dựng một lần cho level.
+
+Khi người chơi lệch khỏi kế hoạch, A* theo cú đẩy chạy từ trạng thái hiện
+tại và dừng ngay khi lấy ra một trạng thái của kế hoạch, rồi nối phần còn
+lại. Số cú đẩy còn lại của mục chính xác là tối ưu và được dùng làm h của
+trạng thái đó, nên khi chỉ nối vào mục chính xác thì lời giải vẫn ít cú đẩy
+nhất. Mục học từ lời giải bên ngoài (learn(), chẳng hạn lời giải ít bước
+đi nhất hoặc đã rút gọn) không chính xác: nối vào đó cho lời giải hợp lệ
+nhưng có thể dài hơn tối ưu, và lần tìm đó không cập nhật h đã học.
+
+Việc tìm kiếm chạy từng đoạn theo ngân sách thời gian (một khung hình), gọi
+lại với cùng trạng thái thì tiếp tục từ chỗ đã dừng.
+
+    python replanner.py --level 4 --deviate 3
+"""
+import argparse
+import heapq
+import itertools
+import random
+import time
+
+from astar_solver import make_estimator
+from board import DIRECTIONS, as_level, normalize_player
+from deadlock import DeadlockDetector
+from heuristics import INF
+from search_stats import SearchStats
+
+# Ngân sách thời gian mặc định cho mỗi lần gọi replan (giây), vừa một khung hình 60 FPS
+FRAME_BUDGET = 0.012
+DIRECTION_INDEX = {name: d for d, (_, _, name) in enumerate(DIRECTIONS)}
+
+class _Search:
+    """Một lần A* theo cú đẩy từ start, chạy từng đoạn tới khi xong"""
+
+    def __init__(self, planner, start):
+        self.planner = planner
+        self.start = start
+        self.stats = SearchStats()
+        self.counter = itertools.count()
+        self.g = {start: 0}
+        self.came_from = {start: None}
+        # Các trạng thái đã mở rộng, để cập nhật h đã học khi xong
+        self.closed = []
+        self.open_set = []
+        self.result = None
+        h = planner._heuristic(start, planner.estimator.evaluate(start[0]))
+        if h is not None:
+            self.open_set.append((h, h, 0, next(self.counter), start))
+
+    def run(self, expires=None, cancel=None):
+        """Mở rộng tới khi xong hoặc hết giờ/bị huỷ; True nếu đã xong.
+
+        Khi xong, result là chuỗi cú đẩy (ô thùng, hướng) tới khi giải
+        xong, hoặc None nếu không có lời giải.
+        """
+        planner = self.planner
+        level = planner.level
+        open_set = self.open_set
+        while open_set:
+            if (cancel is not None and cancel.is_set()) or \
+                    (expires is not None and time.perf_counter() > expires):
+                return False
+            f_score, h, g_score, _, state = heapq.heappop(open_set)
+            if self.g[state] < g_score:
+                continue
+            self.stats.expand(f_score, len(open_set))
+            boxes, player = state
+            known = planner.plan.get(state)
+            if known is not None or level.is_solved(boxes):
+                self._finish(state, known)
+                return True
+            self.closed.append(state)
+            region = level.reachable(player, boxes)
+            for box, d, new_boxes in level.pushes(region, boxes):
+                target = level.neighbors[box][d]
+                if planner.detector.is_deadlock(new_boxes, target):
+                    continue
+                new_state = (new_boxes, normalize_player(level.reachable(box, new_boxes)))
+                new_g = g_score + 1
+                if self.g.get(new_state, INF) <= new_g:
+                    self.stats.duplicates += 1
+                    continue
+                new_h = planner._heuristic(new_state,
+                                           planner.estimator.update(boxes, box, target, new_boxes))
+                if new_h is None:
+                    continue
+                self.g[new_state] = new_g
+                self.came_from[new_state] = (state, (box, d))
+                heapq.heappush(open_set, (new_g + new_h, new_h, new_g, next(self.counter), new_state))
+                self.stats.generated += 1
+        self.stats.finish()
+        return True
+
+    def _finish(self, state, known):
+        """Ghi đường vừa tìm vào kế hoạch, cập nhật h đã học và dựng result.
+
+        known: mục kế hoạch của state, None nếu state là trạng thái đích.
+        """
+        planner = self.planner
+        self.stats.finish()
+        reached = state
+        if known is None:
+            planner.plan[state] = (0, None, True)
+            remaining, exact = 0, True
+        else:
+            remaining, _, exact = known
+        cost = self.g[state] + remaining
+        pushes = []
+        while self.came_from[state] is not None:
+            parent, push = self.came_from[state]
+            planner._remember(parent, cost - self.g[parent], push, exact)
+            pushes.append(push)
+            state = parent
+        pushes.reverse()
+        # C - g(s) chỉ là cận dưới khi C tối ưu, tức là phần nối vào chính xác
+        if exact:
+            for closed in self.closed:
+                learned = cost - self.g[closed]
+                if learned > planner.learned.get(closed, 0):
+                    planner.learned[closed] = learned
+        self.result = pushes + planner._follow(reached)
+
+class Replanner:
+    """Kế hoạch và h đã học của một level, dùng cho gợi ý và giải lại.
+
+    level: Level (như GameState.level) hoặc lưới bất kỳ của level; chỉ dùng
+    phần tĩnh. Không an toàn khi gọi đồng thời từ nhiều luồng.
+    """
+
+    def __init__(self, level, heuristic="matching"):
+        self.level = as_level(level)
+        self.detector = DeadlockDetector(self.level)
+        self.estimator = make_estimator(self.level, heuristic)
+        # Trạng thái -> (số cú đẩy còn lại, cú đẩy kế tiếp hoặc None nếu đã xong,
+        # số cú đẩy còn lại có chắc là tối ưu không)
+        self.plan = {}
+        # Trạng thái -> cận dưới số cú đẩy còn lại học được từ các lần tìm trước
+        self.learned = {}
+        self.search = None
+        # (người chơi, thùng) -> trạng thái chuẩn hoá của lần gọi gần nhất
+        self.origin = None
+        self.start = None
+
+    @property
+    def stats(self):
+        """Thống kê của lần tìm đang dở, None nếu không có"""
+        return self.search.stats if self.search is not None else None
+
+    def _start(self, player, boxes):
+        """Trạng thái chuẩn hoá của (player, boxes); gọi lại liên tiếp thì không tính lại"""
+        if self.origin != (player, boxes):
+            self.origin = (player, boxes)
+            self.start = (boxes, normalize_player(self.level.reachable(player, boxes)))
+        return self.start
+
+    def _heuristic(self, state, estimate):
+        if estimate is None:
+            return None
+        known = self.plan.get(state)
+        if known is not None and known[2]:
+            # Số cú đẩy còn lại tối ưu: h chính xác
+            return known[0]
+        return max(estimate, self.learned.get(state, 0))
+
+    def _remember(self, state, remaining, push, exact):
+        known = self.plan.get(state)
+        if known is None or remaining < known[0] or (remaining == known[0] and exact and not known[2]):
+            self.plan[state] = (remaining, push, exact)
+
+    def _follow(self, state):
+        """Các cú đẩy theo kế hoạch từ state tới khi giải xong"""
+        level = self.level
+        result = []
+        while True:
+            _, push, _ = self.plan[state]
+            if push is None:
+                return result
+            result.append(push)
+            box, d = push
+            boxes = state[0] ^ (1 << box) ^ (1 << level.neighbors[box][d])
+            state = (boxes, normalize_player(level.reachable(box, boxes)))
+
+    def learn(self, start, moves):
+        """Thêm lời giải moves (U/D/L/R) vào kế hoạch; False nếu không hợp lệ.
+
+        start: Level bắt đầu từ trạng thái của lời giải (như SolveJob.level).
+        Lời giải không được coi là ít cú đẩy nhất (mục không chính xác).
+        """
+        level = self.level
+        player, boxes = start.initial_player, start.initial_boxes
+        states = []
+        pushes = []
+        for move in moves:
+            d = DIRECTION_INDEX[move]
+            result = level.move(player, boxes, d)
+            if result is None:
+                continue
+            if result[2]:
+                states.append((boxes, normalize_player(level.reachable(player, boxes))))
+                pushes.append((result[0], d))
+            player, boxes, _ = result
+        if not level.is_solved(boxes):
+            return False
+        self._remember((boxes, normalize_player(level.reachable(player, boxes))), 0, None, True)
+        for i, (state, push) in enumerate(zip(states, pushes)):
+            self._remember(state, len(pushes) - i, push, False)
+        return True
+
+    def replan(self, player, boxes, budget=None, cancel=None):
+        """Lời giải (danh sách U/D/L/R) từ ô player với bitmask thùng boxes.
+
+        player, boxes: trên self.level, như GameState.player_cell/box_mask.
+        budget: số giây tối đa cho lần gọi này (None = tới khi xong).
+        Trả về (xong, lời giải): xong=False nghĩa là hết budget, gọi lại với
+        cùng trạng thái để tìm tiếp; xong=True và lời giải None là không giải được.
+        """
+        start = self._start(player, boxes)
+        if start in self.plan:
+            self.search = None
+            return True, self.level.pushes_to_moves(player, boxes, self._follow(start))
+        if self.search is None or self.search.start != start:
+            self.search = _Search(self, start)
+        expires = time.perf_counter() + budget if budget is not None else None
+        if not self.search.run(expires, cancel):
+            return False, None
+        pushes = self.search.result
+        self.search = None
+        if pushes is None:
+            return True, None
+        return True, self.level.pushes_to_moves(player, boxes, pushes)
+
+    def hint(self, player, boxes, budget=FRAME_BUDGET):
+        """Bước đi kế tiếp nên làm từ (player, boxes).
+
+        Trả về (xong, bước đi, số cú đẩy còn lại) như replan; bước đi None
+        khi chưa xong, không giải được hoặc level đã hoàn thành.
+        """
+        done, moves = self.replan(player, boxes, budget)
+        if not done or not moves:
+            return done, None, None
+        return True, moves[0], self.plan[self._start(player, boxes)][0]
+
+def main():
+    from astar_solver import astar_solve
+    from level_reader import iter_levels
+    from levels import LEVELS
+
+    parser = argparse.ArgumentParser(description="So sánh giải lại bằng Replanner với giải mới bằng A* "
+                                                 "sau khi người chơi lệch khỏi lời giải")
+    parser.add_argument("--level", type=int, default=1, help="Số thứ tự level (từ 1)")
+    parser.add_argument("--collection", metavar="FILE",
+                        help="File bộ level XSB/SOK (mặc định: các level của game)")
+    parser.add_argument("--deviate", type=int, default=3, help="Số cú đẩy ngẫu nhiên lệch khỏi lời giải")
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.collection:
+        levels = [rows for _, rows in iter_levels(args.collection)]
+    else:
+        levels = LEVELS
+    grid = [list(row) for row in levels[args.level - 1]]
+    planner = Replanner(grid)
+    level = planner.level
+    start = time.perf_counter()
+    _, solution = planner.replan(level.initial_player, level.initial_boxes)
+    print(f"Lần đầu: {time.perf_counter() - start:.3f}s, {len(solution)} bước")
+
+    rng = random.Random(args.seed)
+    for trial in range(args.trials):
+        # Đi theo lời giải một đoạn rồi đẩy ngẫu nhiên vài lần (không tạo deadlock)
+        player, boxes = level.initial_player, level.initial_boxes
+        for move in solution[:rng.randrange(len(solution))]:
+            player, boxes, _ = level.move(player, boxes, DIRECTION_INDEX[move])
+        for _ in range(args.deviate):
+            region = level.reachable(player, boxes)
+            options = [(box, d, new_boxes) for box, d, new_boxes in level.pushes(region, boxes)
+                       if not planner.detector.is_deadlock(new_boxes, level.neighbors[box][d])]
+            if not options:
+                break
+            box, d, boxes = rng.choice(options)
+            player = box
+
+        start = time.perf_counter()
+        _, moves = planner.replan(player, boxes)
+        replan_time = time.perf_counter() - start
+        start = time.perf_counter()
+        fresh = astar_solve(level.at(player, boxes), "push")
+        fresh_time = time.perf_counter() - start
+        print(f"Lần {trial + 1}: replan {replan_time:.3f}s ({len(moves) if moves else None} bước), "
+              f"A* mới {fresh_time:.3f}s ({len(fresh) if fresh else None} bước)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Thống kê và quan sát bộ giải, đọc được từ luồng khác trong khi đang giải
+
+Khi không truyền SearchStats vào bộ giải thì không có bộ đếm hay phép
+đo thời gian nào chạy cả.
+"""
+import time
+
+class SearchStats:
+    """Bộ đếm của một lần tìm kiếm.
+
+    sample_every/on_sample: gọi on_sample(stats) sau mỗi sample_every nút
+    được mở rộng (0 = tắt), dùng để vẽ tiến độ hoặc ghi log.
+    """
+
+    def __init__(self, sample_every=0, on_sample=None):
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.frontier = 0
+        self.heap_peak = 0
+        self.heuristic_time = 0.0
+        self.movegen_time = 0.0
+        # (số nút đã mở rộng, f, thời gian) mỗi khi f nhỏ nhất của frontier tăng
+        self.f_trace = []
+        # Bảng chuyển vị bộ giải đang dùng (nếu có), để xuất hits/misses/evictions
+        self.table = None
+        self.sample_every = sample_every
+        self.on_sample = on_sample
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def expand(self, f, frontier):
+        """Ghi nhận một nút được lấy ra khỏi hàng đợi để mở rộng"""
+        self.expanded += 1
+        self.frontier = frontier
+        # Kích thước hàng đợi ngay trước khi lấy nút ra
+        if frontier + 1 > self.heap_peak:
+            self.heap_peak = frontier + 1
+        if not self.f_trace or f > self.f_trace[-1][1]:
+            self.f_trace.append((self.expanded, f, round(self.elapsed(), 4)))
+        if self.sample_every and self.expanded % self.sample_every == 0 and self.on_sample:
+            self.on_sample(self)
+
+    def timed_successors(self, successors):
+        """Bọc hàm sinh trạng thái con để cộng dồn thời gian sinh nước đi"""
+        def wrapper(*args):
+            start = time.perf_counter()
+            children = list(successors(*args))
+            self.movegen_time += time.perf_counter() - start
+            return children
+        return wrapper
+
+    def timed_heuristic(self, estimator):
+        """Bọc đối tượng heuristic để cộng dồn thời gian tính heuristic"""
+        return _TimedHeuristic(estimator, self)
+
+    def track_table(self, table):
+        """Ghi nhận bảng chuyển vị để to_dict xuất kèm thống kê của bảng"""
+        self.table = table
+
+    def finish(self):
+        """Đánh dấu thời điểm kết thúc tìm kiếm"""
+        self.finished = time.perf_counter()
+
+    def elapsed(self):
+        """Thời gian đã chạy (giây)"""
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    def to_dict(self):
+        """Xuất các chỉ số cho benchmark, batch và giao diện"""
+        elapsed = self.elapsed()
+        result = {
+            "expanded": self.expanded,
+            "generated": self.generated,
+            "duplicates": self.duplicates,
+            "heap_peak": self.heap_peak,
+            "heuristic_time": round(self.heuristic_time, 4),
+            "movegen_time": round(self.movegen_time, 4),
+            "elapsed": round(elapsed, 4),
+            "nodes_per_sec": round(self.expanded / elapsed) if elapsed else 0,
+            "f_trace": self.f_trace,
+        }
+        if self.table is not None:
+            result["table"] = self.table.stats()
+        return result
+
+class _TimedHeuristic:
+    """Proxy đo thời gian cho evaluate/update của một heuristic"""
+
+    def __init__(self, estimator, stats):
+        self.estimator = estimator
+        self.stats = stats
+
+    def evaluate(self, boxes):
+        start = time.perf_counter()
+        h = self.estimator.evaluate(boxes)
+        self.stats.heuristic_time += time.perf_counter() - start
+        return h
+
+    def update(self, boxes, old_cell, new_cell, new_boxes):
+        start = time.perf_counter()
+        h = self.estimator.update(boxes, old_cell, new_cell, new_boxes)
+        self.stats.heuristic_time += time.perf_counter() - start
+        return h
@@ -0,0 +1,175 @@
+"""
+Bộ nhớ đệm lời giải lưu trên đĩa (SQLite), khoá theo băm chuẩn hoá của level
+
+Level được chuẩn hoá trước khi băm: cắt bỏ phần bên ngoài tường, rồi chọn
+dạng nhỏ nhất trong 8 phép quay/lật. Lời giải được lưu theo hướng của dạng
+chuẩn nên một level bị quay hay lật vẫn dùng lại được lời giải cũ.
+
+Phần tĩnh (tường, đích) được vẽ một lần cho mỗi level; mỗi lần tra chỉ biến
+đổi vị trí người chơi và thùng, nên tra cache từ một ván đang chơi
+(GameState.search_level()) không phải quét lại lưới.
+"""
+import hashlib
+import os
+import sqlite3
+import time
+
+from astar_solver import SOLVER_VERSION
+from board import DIRECTIONS, as_level, iter_cells
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "solutions.sqlite3")
+
+# Các phép quay/lật dạng ma trận (a, b, c, d): x' = a*x + b*y, y' = c*x + d*y
+TRANSFORMS = [
+    (1, 0, 0, 1), (0, -1, 1, 0), (-1, 0, 0, -1), (0, 1, -1, 0),
+    (-1, 0, 0, 1), (1, 0, 0, -1), (0, 1, 1, 0), (0, -1, -1, 0),
+]
+DIRECTION_VECTORS = {name: (dx, dy) for dx, dy, name in DIRECTIONS}
+VECTOR_DIRECTIONS = {(dx, dy): name for dx, dy, name in DIRECTIONS}
+
+def _render(cells, transform):
+    """Vẽ các ô sau phép biến đổi thành chuỗi; ô ngoài level là tường"""
+    a, b, c, d = transform
+    moved = {(a * x + b * y, c * x + d * y): ch for (x, y), ch in cells.items()}
+    min_x = min(x for x, _ in moved) - 1
+    min_y = min(y for _, y in moved) - 1
+    max_x = max(x for x, _ in moved) + 1
+    max_y = max(y for _, y in moved) + 1
+    rows = []
+    for y in range(min_y, max_y + 1):
+        rows.append("".join(moved.get((x, y), "#") for x in range(min_x, max_x + 1)))
+    return "\n".join(rows), (min_x, min_y)
+
+def static_forms(level):
+    """Với từng phép biến đổi: (tường và đích đã vẽ, phép biến đổi, góc trên trái).
+
+    Chỉ phụ thuộc phần tĩnh của level nên tính một lần cho mỗi level.
+    """
+    cells = {pos: "." if level.goals >> i & 1 else " " for i, pos in enumerate(level.cells)}
+    if not cells:
+        return []
+    forms = []
+    for transform in TRANSFORMS:
+        text, origin = _render(cells, transform)
+        forms.append((text, transform, origin))
+    return forms
+
+def canonical_form(level, forms=None):
+    """(chuỗi chuẩn hoá của trạng thái ban đầu của level, phép biến đổi đã dùng).
+
+    level: Level hoặc lưới ký tự. Với forms = static_forms(level) có sẵn,
+    chỉ tốn O(số thùng): người chơi và thùng được biến đổi rồi so sánh
+    cùng phần tĩnh, chọn dạng nhỏ nhất trong 8 phép quay/lật.
+    """
+    level = as_level(level)
+    if forms is None:
+        forms = static_forms(level)
+    if not forms or level.initial_player < 0:
+        return "", TRANSFORMS[0]
+    px, py = level.cells[level.initial_player]
+    boxes = [level.cells[cell] for cell in iter_cells(level.initial_boxes)]
+    best = None
+    for text, (a, b, c, d), (ox, oy) in forms:
+        player = (a * px + b * py - ox, c * px + d * py - oy)
+        placed = tuple(sorted((a * x + b * y - ox, c * x + d * y - oy) for x, y in boxes))
+        candidate = (text, player, placed)
+        if best is None or candidate < best[0]:
+            best = (candidate, (a, b, c, d))
+    (text, player, placed), transform = best
+    return f"{text}\n{player}\n{placed}", transform
+
+def transform_solution(solution, transform, inverse=False):
+    """Đổi hướng từng bước của lời giải theo phép biến đổi (hoặc phép ngược)"""
+    a, b, c, d = transform
+    if inverse:
+        # Các ma trận ở đây trực giao nên ma trận ngược là ma trận chuyển vị
+        a, b, c, d = a, c, b, d
+    result = []
+    for step in solution:
+        dx, dy = DIRECTION_VECTORS[step]
+        result.append(VECTOR_DIRECTIONS[(a * dx + b * dy, c * dx + d * dy)])
+    return result
+
+def level_key(canonical, mode, version=SOLVER_VERSION):
+    """Khoá cache: băm của level chuẩn hoá, chế độ giải và phiên bản bộ giải"""
+    text = f"{canonical}\n{mode}\n{version}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class SolutionCache:
+    """Kho lời giải bền vững.
+
+    Mục của phiên bản bộ giải khác bị xoá khi mở; khi vượt max_entries thì
+    các mục lâu không dùng nhất bị loại.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=10000, version=SOLVER_VERSION):
+        self.path = path
+        self.max_entries = max_entries
+        self.version = version
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS solutions ("
+            " key TEXT PRIMARY KEY,"
+            " version TEXT NOT NULL,"
+            " mode TEXT NOT NULL,"
+            " solution TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used)")
+        # Lời giải của phiên bản bộ giải cũ không còn hợp lệ
+        self.conn.execute("DELETE FROM solutions WHERE version != ?", (version,))
+        self.conn.commit()
+        # Thời điểm dùng gần nhất, chỉ ghi xuống đĩa khi put() hoặc close()
+        self.touched = {}
+        # (bảng ô của level, static_forms) của level tra gần nhất
+        self.forms = (None, None)
+
+    def _canonical(self, level):
+        level = as_level(level)
+        # Các bản Level.at của cùng một level dùng chung bảng ô
+        if self.forms[0] is not level.cells:
+            self.forms = (level.cells, static_forms(level))
+        return canonical_form(level, self.forms[1])
+
+    def get(self, grid, mode):
+        """Lời giải đã lưu cho grid (lưới ký tự hoặc Level), theo hướng của grid; None nếu chưa có"""
+        canonical, transform = self._canonical(grid)
+        key = level_key(canonical, mode, self.version)
+        row = self.conn.execute("SELECT solution FROM solutions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.touched[key] = time.time()
+        return transform_solution(row[0], transform, inverse=True)
+
+    def put(self, grid, mode, solution):
+        """Lưu lời giải của grid (lưới ký tự hoặc Level), loại bớt mục cũ nếu vượt sức chứa"""
+        canonical, transform = self._canonical(grid)
+        key = level_key(canonical, mode, self.version)
+        stored = "".join(transform_solution(solution, transform))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO solutions (key, version, mode, solution, last_used)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (key, self.version, mode, stored, time.time()),
+        )
+        self._flush_touched()
+        self.conn.execute(
+            "DELETE FROM solutions WHERE key IN ("
+            " SELECT key FROM solutions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.conn.commit()
+
+    def _flush_touched(self):
+        """Ghi thời điểm dùng gần nhất của các mục đã đọc (chưa commit)"""
+        if self.touched:
+            self.conn.executemany("UPDATE solutions SET last_used = ? WHERE key = ?",
+                                  [(used, key) for key, used in self.touched.items()])
+            self.touched = {}
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    def close(self):
+        self._flush_touched()
+        self.conn.commit()
+        self.conn.close()
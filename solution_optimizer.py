@@ -0,0 +1,194 @@
+"""
+Rút gọn lời giải U/D/L/R đã có (từ các chế độ giải nhanh, không tối ưu)
+
+Ba bước, mỗi bước chỉ nhận kết quả ngắn hơn:
+  1. bỏ vòng lặp: cú đẩy đưa về một trạng thái (thùng, vùng người chơi) đã
+     gặp thì cắt cả đoạn ở giữa;
+  2. đi bộ giữa hai cú đẩy luôn theo đường ngắn nhất;
+  3. tìm lại trong từng cửa sổ vài cú đẩy liên tiếp bằng BFS có giới hạn
+     số nút, thay đoạn đó nếu có cách tới cùng trạng thái với ít cú đẩy hơn.
+
+    python solution_optimizer.py results.jsonl -o optimized.jsonl
+"""
+import argparse
+import json
+import time
+
+from board import DIRECTIONS, as_level, normalize_player
+from deadlock import DeadlockDetector
+
+DIRECTION_INDEX = {name: d for d, (_, _, name) in enumerate(DIRECTIONS)}
+
+def solution_pushes(level, moves):
+    """Chuỗi cú đẩy (ô thùng, hướng) của lời giải.
+
+    Bước bị chặn được bỏ qua như khi chơi; ValueError nếu cuối cùng chưa
+    đưa hết thùng vào đích.
+    """
+    player, boxes = level.initial_player, level.initial_boxes
+    pushes = []
+    for move in moves:
+        result = level.move(player, boxes, DIRECTION_INDEX[move])
+        if result is None:
+            continue
+        player, boxes, pushed = result
+        if pushed:
+            pushes.append((player, DIRECTION_INDEX[move]))
+    if not level.is_solved(boxes):
+        raise ValueError("Lời giải không hợp lệ: chưa đưa hết thùng vào đích")
+    return pushes
+
+def _states(level, pushes):
+    """Trạng thái (thùng, người chơi đã chuẩn hoá) trước cú đẩy đầu và sau mỗi cú đẩy"""
+    player, boxes = level.initial_player, level.initial_boxes
+    states = [(boxes, normalize_player(level.reachable(player, boxes)))]
+    for box, d in pushes:
+        boxes ^= (1 << box) | (1 << level.neighbors[box][d])
+        player = box
+        states.append((boxes, normalize_player(level.reachable(player, boxes))))
+    return states
+
+def remove_loops(level, pushes):
+    """Bỏ các đoạn cú đẩy quay về trạng thái đã gặp; trả về (cú đẩy, số vòng đã bỏ)"""
+    kept = []
+    seen = {}
+    loops = 0
+    for i, state in enumerate(_states(level, pushes)):
+        if state in seen:
+            # Quay lại trạng thái cũ: bỏ mọi cú đẩy từ lần gặp trước
+            del kept[seen[state]:]
+            seen = {s: j for s, j in seen.items() if j <= seen[state]}
+            loops += 1
+        else:
+            seen[state] = len(kept)
+        if i < len(pushes):
+            kept.append(pushes[i])
+    return kept, loops
+
+def _shorter_segment(level, detector, start, goal, max_pushes, node_limit):
+    """BFS theo cú đẩy từ trạng thái start tới goal với ít hơn max_pushes cú đẩy.
+
+    Thùng có mặt ở cùng ô trong cả start và goal được giữ nguyên, chỉ đẩy
+    các thùng khác. Trả về chuỗi cú đẩy, None nếu không có hoặc vượt node_limit.
+    """
+    fixed = start[0] & goal[0]
+    came_from = {start: None}
+    frontier = [start]
+    for _ in range(max_pushes - 1):
+        next_frontier = []
+        for state in frontier:
+            boxes, player = state
+            region = level.reachable(player, boxes)
+            for box, d, new_boxes in level.pushes(region, boxes):
+                target = level.neighbors[box][d]
+                if fixed >> box & 1 or detector.is_deadlock(new_boxes, target):
+                    continue
+                new_state = (new_boxes, normalize_player(level.reachable(box, new_boxes)))
+                if new_state in came_from:
+                    continue
+                came_from[new_state] = (state, (box, d))
+                if new_state == goal:
+                    pushes = []
+                    while came_from[new_state] is not None:
+                        new_state, push = came_from[new_state]
+                        pushes.append(push)
+                    pushes.reverse()
+                    return pushes
+                if len(came_from) > node_limit:
+                    return None
+                next_frontier.append(new_state)
+        frontier = next_frontier
+    return None
+
+def optimize_solution(grid, moves, window=12, node_limit=5000, time_limit=5.0, cancel=None):
+    """Rút gọn lời giải moves (danh sách hoặc chuỗi U/D/L/R) của grid.
+
+    window: số cú đẩy của mỗi đoạn được tìm lại; node_limit: số trạng thái
+    tối đa cho mỗi lần tìm; time_limit (giây, None = không giới hạn) và
+    cancel (kiểu threading.Event) dừng sớm, trả về kết quả tốt nhất đến lúc đó.
+    Trả về (lời giải mới, báo cáo) với báo cáo là dict số bước, số cú đẩy
+    trước/sau, số vòng lặp đã bỏ, số đoạn được rút gọn và thời gian chạy.
+    """
+    started = time.perf_counter()
+    expires = started + time_limit if time_limit else None
+    level = as_level(grid)
+    moves = list(moves)
+    pushes = solution_pushes(level, moves)
+    report = {"moves_before": len(moves), "pushes_before": len(pushes)}
+
+    pushes, report["loops_removed"] = remove_loops(level, pushes)
+    best = level.pushes_to_moves(level.initial_player, level.initial_boxes, pushes)
+    if len(best) > len(moves):
+        # Lời giải gốc đã đi bộ ngắn hơn
+        best = moves
+        pushes = solution_pushes(level, moves)
+        report["loops_removed"] = 0
+
+    detector = DeadlockDetector(level)
+    improved = 0
+    states = _states(level, pushes)
+    i = 0
+    while i < len(pushes):
+        if (cancel is not None and cancel.is_set()) or (expires and time.perf_counter() > expires):
+            break
+        size = min(window, len(pushes) - i)
+        segment = _shorter_segment(level, detector, states[i], states[i + size], size, node_limit)
+        if segment is not None:
+            candidate = pushes[:i] + segment + pushes[i + size:]
+            candidate_moves = level.pushes_to_moves(level.initial_player, level.initial_boxes,
+                                                    candidate)
+            # Ít cú đẩy hơn nhưng đường đi bộ có thể dài ra: chỉ nhận khi tổng số bước không tăng
+            if len(candidate_moves) <= len(best):
+                pushes, best = candidate, candidate_moves
+                states = _states(level, pushes)
+                improved += 1
+                continue
+        i += 1
+
+    report["moves_after"] = len(best)
+    report["pushes_after"] = len(pushes)
+    report["windows_improved"] = improved
+    report["saved"] = len(moves) - len(best)
+    report["time"] = round(time.perf_counter() - started, 3)
+    return best, report
+
+def main():
+    from level_reader import iter_levels
+    from levels import LEVELS
+
+    parser = argparse.ArgumentParser(description="Rút gọn các lời giải trong file kết quả của batch_solve")
+    parser.add_argument("results", help="File JSON Lines của batch_solve")
+    parser.add_argument("-o", "--output", default="optimized.jsonl", help="File kết quả sau khi rút gọn")
+    parser.add_argument("--collection", metavar="FILE",
+                        help="File bộ level đã dùng khi giải (mặc định: các level của game)")
+    parser.add_argument("--window", type=int, default=12, help="Số cú đẩy mỗi đoạn được tìm lại")
+    parser.add_argument("--node-limit", type=int, default=5000, help="Số trạng thái tối đa mỗi đoạn")
+    parser.add_argument("--time-limit", type=float, default=60, help="Thời gian tối đa mỗi lời giải (giây)")
+    args = parser.parse_args()
+
+    if args.collection:
+        levels = [rows for _, rows in iter_levels(args.collection)]
+    else:
+        levels = LEVELS
+    total_before = total_after = 0
+    with open(args.results, encoding="utf-8") as f, open(args.output, "w", encoding="utf-8") as out:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("solution"):
+                grid = [list(row) for row in levels[record["level"] - 1]]
+                solution, report = optimize_solution(grid, record["solution"], args.window,
+                                                     args.node_limit, args.time_limit)
+                record["solution"] = "".join(solution)
+                record["length"] = len(solution)
+                record["optimizer"] = report
+                total_before += report["moves_before"]
+                total_after += report["moves_after"]
+                print(f"Level {record['level']}: {report['moves_before']} -> {report['moves_after']} bước, "
+                      f"{report['pushes_before']} -> {report['pushes_after']} cú đẩy")
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    print(f"Tổng: {total_before} -> {total_after} bước")
+
+if __name__ == "__main__":
+    main()
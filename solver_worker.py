@@ -0,0 +1,101 @@
+"""
+Chạy bộ giải (A* hoặc IDA*) trong luồng nền để vòng lặp pygame không bị treo
+"""
+import threading
+
+from search_stats import SearchStats
+from solution_optimizer import optimize_solution
+from solvers import solve
+
+# Các thuật toán cho lời giải ít bước nhất ở mode "move": không cần rút gọn
+MOVE_OPTIMAL = ("astar", "ida", "hda")
+
+class SolveJob:
+    """Một lần giải: level bắt đầu từ trạng thái cần giải, thống kê tiến độ và kết quả.
+
+    level: Level (thường là GameState.search_level()), bộ giải dùng thẳng
+    không quét lại lưới. report: báo cáo của optimize_solution nếu lời giải
+    đã được rút gọn. error: ngoại lệ bộ giải ném ra (job vẫn được đánh dấu
+    xong để giao diện không chờ mãi).
+    """
+
+    def __init__(self, level, generation, mode, algorithm="astar"):
+        self.level = level
+        self.generation = generation
+        self.mode = mode
+        self.algorithm = algorithm
+        self.stats = SearchStats()
+        self.cancel_event = threading.Event()
+        self.solution = None
+        self.report = None
+        self.error = None
+        self.done = False
+
+    def run(self):
+        try:
+            self.solution = solve(self.level, self.algorithm, mode=self.mode,
+                                  stats=self.stats, cancel=self.cancel_event)
+            self.stats.finish()
+            if self.solution and not (self.mode == "move" and self.algorithm in MOVE_OPTIMAL):
+                self.solution, self.report = optimize_solution(self.level, self.solution,
+                                                               cancel=self.cancel_event)
+        except Exception as exc:
+            self.solution = None
+            self.error = exc
+        finally:
+            self.done = True
+
+    def matches(self, state):
+        """Job được giải từ đúng trạng thái hiện tại của state (GameState)"""
+        return (state.level.cells is self.level.cells
+                and state.player_cell == self.level.initial_player
+                and state.box_mask == self.level.initial_boxes)
+
+class SolverWorker:
+    """Quản lý một luồng giải tại một thời điểm.
+
+    Mỗi lần start() hoặc cancel() tăng generation; kết quả của job thuộc
+    generation cũ (đã huỷ hoặc của level khác) không bao giờ được trả ra.
+    """
+
+    def __init__(self, mode="move", algorithm="astar"):
+        self.mode = mode
+        self.algorithm = algorithm
+        self.generation = 0
+        self.job = None
+
+    def start(self, state):
+        """Huỷ job cũ (nếu có) và bắt đầu giải từ trạng thái hiện tại của state (GameState) trong luồng nền"""
+        self.cancel()
+        self.job = SolveJob(state.search_level(), self.generation, self.mode, self.algorithm)
+        thread = threading.Thread(target=self.job.run, daemon=True)
+        thread.start()
+
+    def cancel(self):
+        """Huỷ job đang chạy; kết quả của nó sẽ bị bỏ qua"""
+        self.generation += 1
+        if self.job is not None:
+            self.job.cancel_event.set()
+            self.job = None
+
+    @property
+    def running(self):
+        return self.job is not None and not self.job.done
+
+    @property
+    def pending(self):
+        """Có job đang chạy hoặc đã xong nhưng chưa được poll()"""
+        return self.job is not None
+
+    @property
+    def stats(self):
+        """Thống kê của job hiện tại, None nếu không có job"""
+        return self.job.stats if self.job is not None else None
+
+    def poll(self):
+        """Trả về job vừa giải xong của generation hiện tại (chỉ một lần), ngược lại None"""
+        job = self.job
+        if job is None or not job.done or job.generation != self.generation:
+            return None
+        self.job = None
+        return job
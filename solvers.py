@@ -0,0 +1,40 @@
+"""
+Chọn thuật toán giải cho từng level
+
+    solve(grid, algorithm="ida", mode="push", cancel=deadline)
+
+grid là lưới ký tự hoặc Level (chẳng hạn GameState.search_level(): bắt đầu
+từ trạng thái đang chơi, không phải quét lại lưới).
+
+"astar": nhanh nhất nhưng bộ nhớ tăng theo số nút đã sinh.
+"ida":   bộ nhớ chỉ tỉ lệ với độ sâu lời giải, đổi lại phải mở rộng lại nút.
+"bidir": A* hai chiều (đẩy từ đầu, kéo từ đích), chỉ với mode="push";
+         mỗi chiều dùng heuristic ghép cặp hướng về gốc của chiều kia.
+"anytime": A* có trọng số giảm dần, trả về lời giải tốt nhất khi bị huỷ/hết giờ.
+"hda":   A* song song trên nhiều tiến trình (chia trạng thái theo khoá băm);
+         không chạy được trong tiến trình daemon như Pool của batch_solve.
+"""
+from anytime_solver import anytime_solve
+from astar_solver import astar_solve
+from bidirectional_solver import bidirectional_solve
+from hda_solver import hda_solve
+from ida_solver import ida_solve
+
+SOLVERS = {
+    "astar": astar_solve,
+    "ida": ida_solve,
+    "bidir": bidirectional_solve,
+    "anytime": anytime_solve,
+    "hda": hda_solve,
+}
+
+def solve(grid, algorithm="astar", *, mode, **kwargs):
+    """Giải grid bằng thuật toán đã chọn; các tham số khác chuyển thẳng cho bộ giải.
+
+    mode ("move" hoặc "push") là bắt buộc: mặc định của các bộ giải khác
+    nhau (astar_solve là "move", còn lại là "push"), nên bỏ trống thì tiêu
+    chí tối ưu sẽ đổi theo thuật toán.
+    """
+    if algorithm not in SOLVERS:
+        raise ValueError(f"Thuật toán không hợp lệ: {algorithm}")
+    return SOLVERS[algorithm](grid, mode=mode, **kwargs)
@@ -0,0 +1,96 @@
+"""
+Băm Zobrist cho trạng thái Sokoban và bảng chuyển vị giới hạn bộ nhớ
+"""
+import random
+from collections import OrderedDict
+
+from board import iter_cells
+
+class Zobrist:
+    """Khoá 64 bit cho mỗi (ô, người chơi) và (ô, thùng), cập nhật O(1) mỗi nước đi"""
+
+    def __init__(self, level, seed=20240101):
+        rng = random.Random(seed)
+        self.player = [rng.getrandbits(64) for _ in level.cells]
+        self.box = [rng.getrandbits(64) for _ in level.cells]
+
+    def hash(self, player, boxes):
+        """Tính khoá đầy đủ của một trạng thái (chỉ dùng cho nút gốc)"""
+        key = self.player[player]
+        for cell in iter_cells(boxes):
+            key ^= self.box[cell]
+        return key
+
+    def child(self, key, player, new_player, push):
+        """Khoá của trạng thái con từ khoá cha; push = (ô cũ, ô mới) của thùng hoặc None"""
+        key ^= self.player[player] ^ self.player[new_player]
+        if push is not None:
+            key ^= self.box[push[0]] ^ self.box[push[1]]
+        return key
+
+class TranspositionTable:
+    """Bảng chuyển vị có sức chứa cố định: khoá Zobrist -> g tốt nhất đã gặp.
+
+    policy="lru" loại mục lâu không dùng nhất, policy="fifo" loại mục cũ
+    nhất. Các bộ đếm hits, misses, evictions dùng để chọn sức chứa phù
+    hợp với máy đang chạy; bộ giải đưa chúng vào SearchStats.to_dict()
+    nên có sẵn trong bản ghi của batch_solve và benchmark. Bảng chỉ chặn
+    bộ nhớ của chính nó, không chặn các nút và hàng đợi của A*.
+    """
+
+    POLICIES = ("lru", "fifo")
+
+    def __init__(self, capacity=1000000, policy="lru"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Chính sách loại bỏ không hợp lệ: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """g đã lưu của khoá, None nếu không có (không tính vào thống kê)"""
+        return self.entries.get(key)
+
+    def offer(self, key, g):
+        """Ghi nhận trạng thái với chi phí g.
+
+        Trả về True nếu trạng thái mới hoặc tìm được đường rẻ hơn (cần
+        mở rộng), False nếu đã có đường tốt bằng hoặc hơn.
+        """
+        entries = self.entries
+        best = entries.get(key)
+        if best is not None:
+            self.hits += 1
+            if self.policy == "lru":
+                entries.move_to_end(key)
+            if best <= g:
+                return False
+            entries[key] = g
+            return True
+        self.misses += 1
+        if len(entries) >= self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+        entries[key] = g
+        return True
+
+    def clear(self):
+        """Xoá mọi mục (giữ nguyên các bộ đếm)"""
+        self.entries.clear()
+
+    def stats(self):
+        """Thống kê sử dụng bảng"""
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "policy": self.policy,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self):
+        return len(self.entries)
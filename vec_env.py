@@ -0,0 +1,195 @@
+"""
+Môi trường Sokoban chạy song song N bàn cờ bằng NumPy, không cần pygame
+
+Mỗi bàn là các mảng bool (tường, đích, thùng) cùng kích thước, được đệm
+thêm tường để mọi level vừa chung một khung. Một lần step áp dụng một hành
+động cho mọi bàn bằng các phép toán trên mảng, không có vòng lặp Python theo
+từng bàn. Bàn nào xong (giải được hoặc hết số bước) tự động được đặt lại.
+
+Hành động là chỉ số trong board.DIRECTIONS: 0=U, 1=D, 2=L, 3=R.
+
+Đo tốc độ:
+    python vec_env.py --boards 4096 --steps 1000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from board import DIRECTIONS
+
+# Bước dịch (dy, dx) của từng hành động, cùng thứ tự với DIRECTIONS
+ACTION_DELTAS = np.array([(dy, dx) for dx, dy, _ in DIRECTIONS], dtype=np.int64)
+# Các kênh của quan sát
+WALL, GOAL, BOX, PLAYER = range(4)
+STEP_REWARD = -0.1
+BOX_ON_GOAL_REWARD = 1.0
+SOLVED_REWARD = 10.0
+
+def encode_levels(levels):
+    """Chuyển danh sách level (các dòng ký tự) thành mảng (tường, đích, thùng, người chơi).
+
+    Mỗi level được đệm hai lớp tường để ô cách người chơi hai bước luôn nằm
+    trong mảng, kể cả khi level không có tường bao quanh.
+    """
+    height = max(len(rows) for rows in levels) + 4
+    width = max(len(row) for rows in levels for row in rows) + 4
+    count = len(levels)
+    walls = np.ones((count, height, width), dtype=bool)
+    goals = np.zeros((count, height, width), dtype=bool)
+    boxes = np.zeros((count, height, width), dtype=bool)
+    players = np.zeros((count, 2), dtype=np.int64)
+    for i, rows in enumerate(levels):
+        player = None
+        for y, row in enumerate(rows):
+            for x, c in enumerate(row):
+                if c == "#":
+                    continue
+                walls[i, y + 2, x + 2] = False
+                goals[i, y + 2, x + 2] = c in (".", "+", "*")
+                boxes[i, y + 2, x + 2] = c in ("$", "*")
+                if c in ("@", "+"):
+                    player = (y + 2, x + 2)
+        if player is None:
+            raise ValueError(f"Level {i} không có người chơi")
+        players[i] = player
+    return walls, goals, boxes, players
+
+class VecSokoban:
+    """N bàn Sokoban chạy song song.
+
+    step(actions) trả về (quan sát, phần thưởng, done, info):
+      - quan sát: mảng uint8 (N, 4, H, W) với các kênh WALL, GOAL, BOX, PLAYER
+      - phần thưởng: STEP_REWARD mỗi bước, +/-BOX_ON_GOAL_REWARD khi đẩy thùng
+        vào/ra khỏi đích, thêm SOLVED_REWARD khi giải xong
+      - done: giải xong hoặc đã đi max_steps bước
+      - info: "solved", "truncated" và "final_observation" (quan sát cuối
+        của các bàn vừa xong, trước khi đặt lại)
+    Quan sát trả về cho bàn vừa xong là của ván mới.
+    """
+
+    def __init__(self, levels, num_boards, max_steps=200, seed=None):
+        self.walls_bank, self.goals_bank, self.boxes_bank, self.players_bank = encode_levels(levels)
+        self.num_boards = num_boards
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+        _, height, width = self.walls_bank.shape
+        self.walls = np.empty((num_boards, height, width), dtype=bool)
+        self.goals = np.empty((num_boards, height, width), dtype=bool)
+        self.boxes = np.empty((num_boards, height, width), dtype=bool)
+        self.players = np.empty((num_boards, 2), dtype=np.int64)
+        self.level_ids = np.zeros(num_boards, dtype=np.int64)
+        self.steps = np.zeros(num_boards, dtype=np.int64)
+        # Số thùng chưa nằm trên đích của từng bàn
+        self.remaining = np.zeros(num_boards, dtype=np.int64)
+        self._rows = np.arange(num_boards)
+
+    def reset(self, level_ids=None):
+        """Đặt lại mọi bàn; level_ids mặc định chọn ngẫu nhiên. Trả về quan sát"""
+        self._reset_boards(self._rows, level_ids)
+        return self.observe()
+
+    def _reset_boards(self, rows, level_ids=None):
+        if level_ids is None:
+            level_ids = self.rng.integers(len(self.walls_bank), size=len(rows))
+        level_ids = np.asarray(level_ids, dtype=np.int64)
+        self.level_ids[rows] = level_ids
+        self.walls[rows] = self.walls_bank[level_ids]
+        self.goals[rows] = self.goals_bank[level_ids]
+        self.boxes[rows] = self.boxes_bank[level_ids]
+        self.players[rows] = self.players_bank[level_ids]
+        self.steps[rows] = 0
+        self.remaining[rows] = (self.boxes[rows] & ~self.goals[rows]).sum(axis=(1, 2))
+
+    def observe(self):
+        """Quan sát hiện tại: mảng uint8 (N, 4, H, W)"""
+        obs = np.empty((self.num_boards, 4) + self.walls.shape[1:], dtype=np.uint8)
+        self._fill_observation(obs, self._rows)
+        return obs
+
+    def _fill_observation(self, obs, rows):
+        obs[rows] = 0
+        obs[rows, WALL] = self.walls[rows]
+        obs[rows, GOAL] = self.goals[rows]
+        obs[rows, BOX] = self.boxes[rows]
+        obs[rows, PLAYER, self.players[rows, 0], self.players[rows, 1]] = 1
+
+    def step(self, actions):
+        """Áp dụng actions (mảng N chỉ số hướng) cho mọi bàn cùng lúc"""
+        rows = self._rows
+        delta = ACTION_DELTAS[np.asarray(actions, dtype=np.int64)]
+        py, px = self.players[:, 0], self.players[:, 1]
+        ty, tx = py + delta[:, 0], px + delta[:, 1]
+        by, bx = ty + delta[:, 0], tx + delta[:, 1]
+
+        box_ahead = self.boxes[rows, ty, tx]
+        behind_free = ~(self.walls[rows, by, bx] | self.boxes[rows, by, bx])
+        push = box_ahead & behind_free
+        moved = ~self.walls[rows, ty, tx] & (~box_ahead | push)
+
+        # Đẩy thùng: cập nhật số thùng chưa vào đích theo đích ở ô cũ/ô mới
+        pushed = rows[push]
+        self.boxes[pushed, ty[push], tx[push]] = False
+        self.boxes[pushed, by[push], bx[push]] = True
+        goal_change = np.zeros(self.num_boards, dtype=np.int64)
+        goal_change[push] = (self.goals[pushed, by[push], bx[push]].astype(np.int64)
+                             - self.goals[pushed, ty[push], tx[push]])
+        self.remaining -= goal_change
+        self.players[moved] = np.stack([ty[moved], tx[moved]], axis=1)
+        self.steps += 1
+
+        solved = self.remaining == 0
+        truncated = ~solved & (self.steps >= self.max_steps)
+        rewards = STEP_REWARD + BOX_ON_GOAL_REWARD * goal_change + SOLVED_REWARD * solved
+        done = solved | truncated
+
+        info = {"solved": solved, "truncated": truncated}
+        obs = self.observe()
+        if done.any():
+            info["final_observation"] = obs[done]
+            finished = rows[done]
+            self._reset_boards(finished)
+            self._fill_observation(obs, finished)
+        return obs, rewards, done, info
+
+    def grid(self, i):
+        """Lưới ký tự của bàn i (bỏ phần đệm), dùng được cho các bộ giải"""
+        level_id = self.level_ids[i]
+        walls = self.walls_bank[level_id]
+        open_rows, open_cols = np.nonzero(~walls)
+        top, left = open_rows.min() - 1, open_cols.min() - 1
+        bottom, right = open_rows.max() + 2, open_cols.max() + 2
+        chars = np.full(walls.shape, " ", dtype="<U1")
+        chars[walls] = "#"
+        chars[self.goals[i]] = "."
+        chars[self.boxes[i]] = "$"
+        chars[self.boxes[i] & self.goals[i]] = "*"
+        y, x = self.players[i]
+        chars[y, x] = "+" if self.goals[i, y, x] else "@"
+        return [list(row) for row in chars[top:bottom, left:right]]
+
+def main():
+    from levels import LEVELS
+
+    parser = argparse.ArgumentParser(description="Đo tốc độ môi trường song song với hành động ngẫu nhiên")
+    parser.add_argument("--boards", type=int, default=4096, help="Số bàn chạy song song")
+    parser.add_argument("--steps", type=int, default=1000, help="Số lần step")
+    parser.add_argument("--max-steps", type=int, default=200, help="Số bước tối đa mỗi ván")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    env = VecSokoban(LEVELS, args.boards, max_steps=args.max_steps, seed=args.seed)
+    env.reset()
+    rng = np.random.default_rng(args.seed)
+    actions = rng.integers(len(DIRECTIONS), size=(args.steps, args.boards))
+    solved = 0
+    start = time.perf_counter()
+    for step_actions in actions:
+        _, _, _, info = env.step(step_actions)
+        solved += int(info["solved"].sum())
+    elapsed = time.perf_counter() - start
+    total = args.steps * args.boards
+    print(f"{total} bước trong {elapsed:.2f}s ({total / elapsed:,.0f} bước/s), {solved} ván giải xong")
+
+if __name__ == "__main__":
+    main()